@@ -0,0 +1,126 @@
+import pygame
+from collections import OrderedDict
+
+import startup
+
+# shared image cache, every file is decoded once and converted to the display format
+# surfaces handed out here are shared so dont draw on them, copy() first
+# scaled() only keeps its result, not the full size decode (the cats are 4 MB each)
+# tinted() builds a new surface every call, whoever makes sprites from it keeps the finished
+# one in its own cache and hands that to track() so surface_bytes() counts it
+# preload() decodes on a thread pool, pygame lets go of the GIL while it decodes
+
+_images = {} # (path, alpha) -> surface
+_scaled = {} # (path, size, alpha) -> surface
+_fonts = {} # (path, size) -> font
+_tracked = [] # caches of generated sprites kept by other modules
+
+TINT_SOURCE = (260, 120) # tinted sprites are cut from a copy this size, not the full image
+TEXT_CACHE_SIZE = 256
+_texts = OrderedDict() # (font, text, colour) -> surface, least recently used first
+
+
+def _convert(image, alpha):
+    if pygame.display.get_surface() is None: # convert needs a display mode
+        return image, False
+    if alpha:
+        return image.convert_alpha(), True
+    return image.convert(), True
+
+
+def _load(path, alpha): # (surface, converted), uncached
+    with startup.report.asset('image', path):
+        return _convert(pygame.image.load(path), alpha)
+
+
+def image(path, alpha=True):
+    key = (path, alpha)
+    surface = _images.get(key)
+    if surface is None:
+        surface, converted = _load(path, alpha)
+        if not converted: # try again once the display exists
+            return surface
+        _images[key] = surface
+    return surface
+
+
+def background(path): # backgrounds are opaque, plain convert() blits faster
+    return image(path, alpha=False)
+
+
+def preload(pool, paths, alpha=True, size=None): # image() or scaled() just hit the cache afterwards
+    if size:
+        return [pool.submit(scaled, path, size, alpha) for path in paths]
+    return [pool.submit(image, path, alpha) for path in paths]
+
+
+def scaled(path, size, alpha=True): # fits inside size, keeps the aspect ratio
+    key = (path, tuple(size), alpha)
+    surface = _scaled.get(key)
+    if surface is None:
+        source = _images.get((path, alpha))
+        if source is None:
+            source = _load(path, alpha)[0]
+        surface = scale(source, size)
+        if pygame.display.get_surface() is None:
+            return surface
+        _scaled[key] = surface
+    return surface
+
+
+def tinted(path, size, tint): # stretched to exactly size and multiplied by tint, a new surface, not cached
+    surface = pygame.transform.smoothscale(scaled(path, TINT_SOURCE), size)
+    surface.fill(tint, special_flags=pygame.BLEND_RGBA_MULT)
+    return surface
+
+
+def track(cache): # dict of surfaces another module keeps, counted by surface_bytes() and emptied by clear()
+    _tracked.append(cache)
+    return cache
+
+
+def font(path, size): # path None is pygame's default font
+    key = (path, size)
+    f = _fonts.get(key)
+    if f is None:
+        with startup.report.asset('font', f"{path}@{size}"):
+            f = _fonts[key] = pygame.font.Font(path, size)
+    return f
+
+
+def text(font, string, colour, antialias=True):
+    # rendered text surfaces, so a string that didnt change is never rasterized again
+    key = (font, string, tuple(colour), antialias)
+    surface = _texts.get(key)
+    if surface is not None:
+        _texts.move_to_end(key)
+        return surface
+    surface = _texts[key] = font.render(string, antialias, colour)
+    if len(_texts) > TEXT_CACHE_SIZE:
+        _texts.popitem(last=False)
+    return surface
+
+
+def surface_bytes(): # pixel memory held by the caches, shared surfaces counted once
+    surfaces = {id(s): s for cache in (_images, _scaled, _texts, *_tracked) for s in cache.values()}
+    return sum(s.get_bytesize() * s.get_width() * s.get_height() for s in surfaces.values())
+
+
+def clear():
+    _images.clear()
+    _scaled.clear()
+    _fonts.clear()
+    _texts.clear()
+    for cache in _tracked:
+        cache.clear()
+
+
+def scale(image, size):
+    w, h = image.get_size()
+    sc = min(size[0] / w, size[1] / h)
+
+    new_w = int(w * sc)
+    new_h = int(h * sc)
+
+    new_image = pygame.transform.scale(image, (new_w, new_h))
+    return new_image
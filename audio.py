@@ -0,0 +1,97 @@
+import os
+import threading
+
+import pygame
+
+import startup
+
+# music streams from disk through pygame.mixer.music instead of being decoded into memory
+# sound effects decode on first use (or on a loader pool) and play on a small channel pool
+
+
+class Music:
+    def __init__(self, path, volume=1.0):
+        self.path = path
+        self.volume = volume
+
+    def play(self, loops=-1):
+        with startup.report.asset('music', self.path):
+            pygame.mixer.music.load(self.path)
+        pygame.mixer.music.set_volume(self.volume)
+        pygame.mixer.music.play(loops)
+
+    def stop(self):
+        pygame.mixer.music.stop()
+
+    def set_volume(self, volume): # 0 to 1 like Sound.set_volume
+        self.volume = volume
+        pygame.mixer.music.set_volume(volume)
+
+
+class Effect:
+    def __init__(self, bank, path, volume=1.0):
+        self.bank = bank
+        self.path = path
+        self.volume = volume
+        self.sound = None
+        self.lock = threading.Lock() # per effect so a pool can decode them side by side
+
+    def load(self):
+        with self.lock:
+            if self.sound is None:
+                with startup.report.asset('sound', self.path):
+                    sound = pygame.mixer.Sound(self.path)
+                sound.set_volume(self.volume)
+                self.sound = sound
+        return self.sound
+
+    def play(self):
+        sound = self.sound or self.load()
+        self.bank.channel().play(sound)
+
+    def set_volume(self, volume):
+        self.volume = volume
+        if self.sound is not None:
+            self.sound.set_volume(volume)
+
+
+class SoundEffects:
+    def __init__(self, path, volume=1.0, channels=4):
+        self.effects = {}
+        for file in os.listdir(path): # only lists, nothing is decoded yet
+            name = os.path.splitext(file)[0]
+            self.effects[name] = Effect(self, os.path.join(path, file), volume)
+
+        # reserved channels so music or other sounds never take them
+        pygame.mixer.set_reserved(channels)
+        self.channels = [pygame.mixer.Channel(i) for i in range(channels)]
+        self.next = 0
+
+    def __getitem__(self, name):
+        return self.effects[name]
+
+    def values(self):
+        return self.effects.values()
+
+    def set_volume(self, volume):
+        for effect in self.effects.values():
+            effect.set_volume(volume)
+
+    def channel(self): # an idle channel, otherwise take them over in turn
+        for channel in self.channels:
+            if not channel.get_busy():
+                return channel
+        channel = self.channels[self.next]
+        self.next = (self.next + 1) % len(self.channels)
+        return channel
+
+    def preload(self, pool=None): # decode everything in the background so the first click doesnt wait
+        if pool is not None:
+            return [pool.submit(effect.load) for effect in self.effects.values()]
+        thread = threading.Thread(target=self._preload, daemon=True)
+        thread.start()
+        return thread
+
+    def _preload(self):
+        for effect in list(self.effects.values()):
+            effect.load()
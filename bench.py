@@ -0,0 +1,362 @@
+import os
+# headless, has to be set before pygame gets imported
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+
+# benchmarks for the data structures, the engine and every scene's frame
+# python bench.py > base.json, change things, python bench.py --compare base.json
+# every result has a value where lower is better, --compare fails (exit 1) when one
+# got slower than --threshold
+# run from the repo folder, the game loads its assets by relative path
+
+BENCHES = [] # (group, function(quick) -> {name: result})
+_game = None # (main module, Game) shared by the benches that need a window
+
+
+def bench(group):
+    def register(fn):
+        BENCHES.append((group, fn))
+        return fn
+    return register
+
+
+def measure(fn, ops, repeat=5, setup=None): # best of repeat runs of fn doing ops operations
+    samples = []
+    for _ in range(repeat):
+        arg = setup() if setup else None
+        start = time.perf_counter()
+        fn(arg)
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return {"value": samples[0] / ops * 1e6, "unit": "us/op", "median": samples[len(samples) // 2] / ops * 1e6,
+            "ops": ops, "repeat": repeat}
+
+
+def frame_stats(times): # seconds per frame -> ms stats
+    times = sorted(times)
+    n = len(times)
+    return {"value": sum(times) / n * 1000, "unit": "ms/frame", "p50": times[n // 2] * 1000,
+            "p95": times[min(n - 1, int(n * 0.95))] * 1000, "p99": times[min(n - 1, int(n * 0.99))] * 1000,
+            "worst": times[-1] * 1000, "frames": n}
+
+
+@bench('stack')
+def stack_bench(quick):
+    from stack import Stack
+    results = {}
+    for depth in (10, 100, 1000) if quick else (10, 100, 1000, 10000):
+        def filled():
+            s = Stack()
+            for i in range(depth):
+                s.insert(i)
+            return s
+        lookups = [random.randrange(depth) for _ in range(1000)]
+
+        def insert(_):
+            s = Stack()
+            for i in range(depth):
+                s.insert(i)
+
+        def pop(s):
+            while s:
+                s.get()
+
+        def get_index(s):
+            for i in lookups:
+                s.getIndex(i)
+
+        def index(s):
+            for i in lookups:
+                s.index(i)
+
+        def iterate(s):
+            for _ in range(10):
+                for _ in s:
+                    pass
+
+        def popleft(s):
+            for _ in range(min(depth, 100)):
+                s.popleft()
+
+        results[f"insert[{depth}]"] = measure(insert, depth)
+        results[f"get[{depth}]"] = measure(pop, depth, setup=filled)
+        results[f"getIndex[{depth}]"] = measure(get_index, len(lookups), setup=filled)
+        results[f"index[{depth}]"] = measure(index, len(lookups), setup=filled)
+        results[f"iterate[{depth}]"] = measure(iterate, depth * 10, setup=filled)
+        results[f"popleft[{depth}]"] = measure(popleft, min(depth, 100), setup=filled)
+    return results
+
+
+@bench('tree')
+def tree_bench(quick):
+    from tree import BinaryTree
+    results = {}
+    rng = random.Random(42)
+    for n in (1000, 10000) if quick else (1000, 10000, 100000):
+        repeat = 3 if n >= 100000 else 5
+        shuffled = [{"name": f"p{i}", "score": rng.randrange(n * 10)} for i in range(n)]
+        ordered = sorted(shuffled, key=lambda entry: entry['score'])
+
+        def insert(entries):
+            def run(_):
+                tree = BinaryTree()
+                for entry in entries:
+                    tree.insert(entry)
+            return run
+
+        def built():
+            return BinaryTree.from_sorted(ordered)
+
+        def top(k):
+            def run(tree):
+                for _ in range(100):
+                    tree.get_first_values(k)
+            return run
+
+        scores = [rng.randrange(n * 10) for _ in range(1000)]
+        ranks = [rng.randint(1, n) for _ in range(1000)]
+
+        def rank(tree):
+            for score in scores:
+                tree.rank(score)
+
+        def select(tree):
+            for r in ranks:
+                tree.select(r)
+
+        results[f"insert_random[{n}]"] = measure(insert(shuffled), n, repeat)
+        results[f"insert_sorted[{n}]"] = measure(insert(ordered), n, repeat)
+        results[f"from_sorted[{n}]"] = measure(lambda _: BinaryTree.from_sorted(ordered), n, repeat)
+        results[f"top10[{n}]"] = measure(top(10), 100, setup=built)
+        results[f"top100[{n}]"] = measure(top(100), 100, setup=built)
+        results[f"rank[{n}]"] = measure(rank, len(scores), setup=built)
+        results[f"select[{n}]"] = measure(select, len(ranks), setup=built)
+    return results
+
+
+@bench('engine')
+def engine_bench(quick):
+    from engine import HanoiState
+    import puzzles
+    import replay
+    import solver
+    results = {}
+    for rings in (10, 14) if quick else (10, 14, 18):
+        moves = (1 << rings) - 1
+
+        def solve(_):
+            state = HanoiState(rings)
+            for move in solver.solution(state):
+                state.apply(*move)
+
+        results[f"solve[{rings}]"] = measure(solve, moves, 3)
+
+    rng = random.Random(7)
+    states = [puzzles.generate(9, rng=rng) for _ in range(1000)]
+    results["next_move[9]"] = measure(lambda _: [solver.next_move(state) for state in states], len(states))
+    results["generate[9]"] = measure(lambda _: [puzzles.generate(9, rng=rng) for _ in range(1000)], 1000)
+
+    games = []
+    for state in states[:200]:
+        record = replay.Replay(9, puzzles.state_index(state), True)
+        state = state.copy()
+        for i, move in enumerate(solver.solution(state)):
+            state.apply(*move)
+            record.record(*move, i * 0.7)
+        games.append(record.finish(len(state.history) * 0.7))
+    results["replay_verify[9]"] = measure(lambda _: [replay.verify(data) for data in games], len(games))
+    return results
+
+
+def get_game(quick):
+    global _game
+    if _game:
+        return _game
+    import main
+    from store import ScoreStore
+    # a throwaway board so the real leaderboard.db isnt opened, let alone written
+    scores = ScoreStore(':memory:', legacy=None)
+    rng = random.Random(3)
+    for i in range(2000 if quick else 20000):
+        scores.save(f"player{i}", rng.randrange(9000), rng.randint(3, 9), rng.random() < 0.5)
+    game = main.Game(fps_mode='uncapped', scores=scores)
+    main.game = game
+    # wait for the startup threads so they dont land in the timings
+    game.loader.shutdown(wait=True)
+    while game.gamescene.loading:
+        time.sleep(0.01)
+    _game = main, game
+    return _game
+
+
+@bench('hanoi')
+def hanoi_bench(quick):
+    # full solves through the game's Hanoi, clicks in, sprites and dirty rects out
+    import pygame
+    import solver
+    main, game = get_game(quick)
+    results = {}
+    for rings in (3, 6, 9):
+        scene = main.TowerCats(game, rings)
+        game.gamescene.set_scene(scene)
+        hanoi = scene.hanoi
+        clicks = []
+        for source, target in solver.solution(hanoi.state.copy()):
+            for tower in (source, target):
+                clicks.append(pygame.event.Event(pygame.MOUSEBUTTONUP, pos=hanoi.towers.index(tower).hitbox_rect.center, button=1))
+        start = time.perf_counter()
+        for event in clicks:
+            hanoi.click(event)
+        seconds = time.perf_counter() - start
+        assert hanoi.state.is_solved()
+        moves = len(clicks) // 2
+        results[f"solve[{rings}]"] = {"value": seconds / moves * 1e6, "unit": "us/move", "moves": moves}
+        game.renderer.rects.clear()
+    game.gamescene.open(main.MainMenu)
+    return results
+
+
+@bench('scene')
+def scene_bench(quick):
+    # steady state frames like the main loop runs them, minus the clock
+    import pygame_widgets
+    main, game = get_game(quick)
+    frames = 60 if quick else 300
+
+    def run(scene_factory, full=False, setup=None):
+        scene_factory()
+        scene = game.gamescene.get_scene()
+        if setup:
+            setup(scene)
+        times = []
+        for i in range(frames + 10):
+            start = time.perf_counter()
+            if full:
+                game.renderer.invalidate()
+            if game.renderer.full:
+                game.screen.fill((255, 255, 255))
+            game.gamescene.update([])
+            pygame_widgets.update([])
+            game.renderer.present()
+            if i >= 10: # first frames after a switch are full redraws
+                times.append(time.perf_counter() - start)
+        return frame_stats(times)
+
+    def autoplay(scene):
+        game.delta = scene.hanoi.autoplay_delay # a move every frame
+        scene.hanoi.set_autoplay(True)
+
+    scenes = {
+        "MainMenu": lambda: game.gamescene.open(main.MainMenu),
+        "Settings": lambda: game.gamescene.open(main.Settings),
+        "GameSelection": lambda: game.gamescene.open(main.GameSelection),
+        "Leaderboard": lambda: game.gamescene.open(main.Leaderboard),
+        "TowerCats": lambda: game.gamescene.set_scene(main.TowerCats(game, 9)),
+        "Winner": lambda: game.gamescene.set_scene(main.Winner(game, 4321, 5, False)),
+    }
+    results = {}
+    for name, factory in scenes.items():
+        game.delta = 0
+        results[f"{name}"] = run(factory)
+        results[f"{name}.full"] = run(factory, full=True)
+    results["TowerCats.autoplay"] = run(lambda: game.gamescene.set_scene(main.TowerCats(game, 9)), setup=autoplay)
+    results["TowerCats[64].autoplay"] = run(lambda: game.gamescene.set_scene(main.TowerCats(game, 64)), setup=autoplay)
+    game.delta = 0
+    game.gamescene.open(main.MainMenu)
+    return results
+
+
+@bench('memory')
+def memory_bench(quick):
+    # python bytes per leaderboard node and per big game, traced with tracemalloc
+    import tracemalloc
+    import assets
+    from tree import BinaryTree
+    main, game = get_game(quick)
+    rng = random.Random(5)
+    n = 2000 if quick else 20000
+    entries = [{"name": f"p{i}", "score": rng.randrange(n * 10)} for i in range(n)]
+    results = {}
+
+    def traced(build):
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        kept = build() # kept alive until measured
+        size = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+        return size, kept
+
+    def tree():
+        tree = BinaryTree()
+        for entry in entries:
+            tree.insert(entry)
+        return tree
+    size, _ = traced(tree)
+    results[f"tree_node[{n}]"] = {"value": size / n, "unit": "bytes/node"}
+    for rings in (9, 64):
+        main.TowerCats(game, rings).destroy() # sprite caches warm, only the game itself counts
+        size, scene = traced(lambda: main.TowerCats(game, rings))
+        scene.destroy()
+        results[f"TowerCats[{rings}]"] = {"value": size / 1024, "unit": "kB"}
+    results["surfaces"] = {"value": assets.surface_bytes() / 1024, "unit": "kB"}
+    return results
+
+
+def compare(results, baseline, threshold): # [(name, old, new)] for everything that got slower
+    slower = []
+    for name, result in results.items():
+        old = baseline.get(name)
+        if old and old.get("unit") == result.get("unit") and result["value"] > old["value"] * (1 + threshold):
+            slower.append((name, old["value"], result["value"]))
+    return slower
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Tower of Cats benchmarks")
+    parser.add_argument('--quick', action='store_true', help="smaller sizes and fewer frames")
+    parser.add_argument('--only', nargs='*', default=None, help="groups to run: " + ", ".join(g for g, _ in BENCHES))
+    parser.add_argument('--out', help="write the JSON here instead of stdout")
+    parser.add_argument('--compare', help="baseline JSON from an earlier run, exit 1 on regressions")
+    parser.add_argument('--threshold', type=float, default=0.25, help="allowed slowdown before it counts, 0.25 = 25%%")
+    args = parser.parse_args()
+
+    random.seed(0)
+    results = {}
+    for group, fn in BENCHES:
+        if args.only and group not in args.only:
+            continue
+        for name, result in fn(args.quick).items():
+            results[f"{group}.{name}"] = {key: round(value, 4) if isinstance(value, float) else value
+                                          for key, value in result.items()}
+    if _game:
+        _game[1].shutdown()
+
+    import pygame
+    output = {
+        "meta": {"python": platform.python_version(), "pygame": pygame.version.ver, "platform": platform.platform(),
+                 "quick": args.quick, "time": time.strftime('%Y-%m-%dT%H:%M:%S')},
+        "results": results,
+    }
+    text = json.dumps(output, indent=2)
+    if args.out:
+        with open(args.out, 'w') as file:
+            file.write(text)
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, 'r') as file:
+            baseline = json.load(file)["results"]
+        slower = compare(results, baseline, args.threshold)
+        for name, old, new in slower:
+            print(f"slower: {name} {old:.3f} -> {new:.3f} ({new / old - 1:+.0%})", file=sys.stderr)
+        if slower:
+            raise SystemExit(1)
@@ -0,0 +1,78 @@
+import pygame
+from array import array
+
+# one clock for the whole game
+# capped   - sleeps to hold the fps
+# vsync    - the display flip waits for the screen, clock only measures, main.py falls back
+#            to capped when the window cant get vsync, and an idle frame flips nothing so
+#            that one is capped too
+# uncapped - as fast as it goes, for benchmarking
+MODES = ('capped', 'vsync', 'uncapped')
+
+
+class FrameClock:
+    def __init__(self, fps=30, mode='capped', fixed_step=False, history=256):
+        if mode not in MODES:
+            raise ValueError(f"Unknown frame mode {mode!r}, expected one of {MODES}")
+        self.fps = fps
+        self.mode = mode
+        # fixed step: the game timer only moves in whole 1/fps steps so scores dont depend on frame jitter
+        self.step = 1 / fps if fixed_step else None
+        self.max_delta = 0.25 # a stall (window drag, loading) counts as at most this much game time
+        self.clock = pygame.time.Clock()
+        # raw frame times in seconds, a preallocated ring of unboxed doubles so a tick
+        # doesnt allocate (a deque grabs a new block every 64 frames), 256 keeps the
+        # index one of python's cached small ints
+        self.history = array('d', bytes(8 * history))
+        self.index = 0 # where the next frame goes
+        self.wrapped = False
+        self.accumulator = 0
+        self.started = False
+
+    def tick(self, idle=False): # call once per frame, returns the delta for the game in seconds
+        # idle: the renderer wont present this frame
+        if self.mode == 'capped' or (idle and self.mode == 'vsync'):
+            ms = self.clock.tick(self.fps)
+        else:
+            ms = self.clock.tick()
+        dt = ms / 1000
+        if not self.started: # first tick measures startup, not a frame
+            self.started = True
+            dt = 0
+        else:
+            self.history[self.index] = dt
+            self.index += 1
+            if self.index == len(self.history):
+                self.index = 0
+                self.wrapped = True
+        dt = min(dt, self.max_delta)
+
+        if self.step is None:
+            return dt
+        self.accumulator += dt
+        steps = int(self.accumulator / self.step)
+        self.accumulator -= steps * self.step
+        return steps * self.step
+
+    def get_fps(self):
+        return self.clock.get_fps()
+
+    @property
+    def frames(self): # the recorded frame times, oldest first
+        if not self.wrapped:
+            return self.history[:self.index]
+        return self.history[self.index:] + self.history[:self.index]
+
+    def stats(self): # rolling frame time stats in milliseconds
+        frames = self.frames
+        if not frames:
+            return {'frames': 0, 'mean': 0, 'p95': 0, 'p99': 0, 'worst': 0}
+        times = sorted(frames)
+        n = len(times)
+        return {
+            'frames': n,
+            'mean': sum(times) / n * 1000,
+            'p95': times[min(n - 1, int(n * 0.95))] * 1000,
+            'p99': times[min(n - 1, int(n * 0.99))] * 1000,
+            'worst': times[-1] * 1000,
+        }
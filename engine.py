@@ -0,0 +1,134 @@
+# pure python tower of hanoi rules, no pygame so solvers/bots/tests can run headless
+# each peg is an int bitmask, bit (ring - 1) is set when that ring is on the peg
+# ring 1 is the smallest, so the top of a peg is its lowest set bit
+
+
+MAX_RINGS = 64 # biggest game there is, replays asking for more are rejected before anything gets built
+
+
+class IllegalMove(ValueError):
+    pass
+
+
+MOVES = [(source, target) for source in range(3) for target in range(3) if source != target] # every move between 3 pegs
+
+
+# the rules on a bare list of peg masks, for loops that play thousands of moves and keep
+# no history (replay checks, the simulator), HanoiState uses the same ones
+def can_move(pegs, source, target):
+    if source == target:
+        return False
+    src = pegs[source]
+    if not src:
+        return False
+    dst = pegs[target]
+    # lowest bits compare directly, a smaller ring has the lower bit
+    return not dst or (src & -src) < (dst & -dst)
+
+
+def legal_moves(pegs): # the check inlined, the random bot asks for this every move
+    n = len(pegs)
+    moves = []
+    for source, target in MOVES if n == 3 else [(s, t) for s in range(n) for t in range(n) if s != t]:
+        src = pegs[source]
+        dst = pegs[target]
+        if src and (not dst or src & -src < dst & -dst):
+            moves.append((source, target))
+    return moves
+
+
+def step(pegs, source, target): # moves the top ring in place without checking, returns its bit
+    src = pegs[source]
+    bit = src & -src
+    pegs[source] = src ^ bit
+    pegs[target] |= bit
+    return bit
+
+
+class HanoiState:
+    def __init__(self, rings=3, pegs=3, start=0):
+        self.rings = rings
+        self.full = (1 << rings) - 1
+        self.pegs = [0] * pegs
+        self.pegs[start] = self.full
+        self.history = [] # (source, target) of every applied move
+        self.moves = 0
+
+    @classmethod
+    def from_pegs(cls, pegs, rings=None): # pegs: list of ring lists per peg, e.g. [[3, 2], [], [1]]
+        if rings is None:
+            rings = sum(len(peg) for peg in pegs)
+        state = cls(rings, len(pegs))
+        seen = 0
+        for i, peg in enumerate(pegs):
+            mask = 0
+            for ring in peg:
+                bit = 1 << (ring - 1)
+                if ring < 1 or ring > rings or seen & bit:
+                    raise ValueError(f"Bad ring {ring} on peg {i}")
+                seen |= bit
+                mask |= bit
+            state.pegs[i] = mask
+        if seen != state.full:
+            raise ValueError("Every ring has to be on a peg")
+        return state
+
+    def copy(self):
+        state = HanoiState.__new__(HanoiState)
+        state.rings = self.rings
+        state.full = self.full
+        state.pegs = self.pegs.copy()
+        state.history = self.history.copy()
+        state.moves = self.moves
+        return state
+
+    def top(self, peg): # smallest ring on the peg, 0 if empty
+        mask = self.pegs[peg]
+        return (mask & -mask).bit_length()
+
+    def peg_of(self, ring):
+        bit = 1 << (ring - 1)
+        for i, mask in enumerate(self.pegs):
+            if mask & bit:
+                return i
+        raise ValueError(f"No ring {ring}")
+
+    def legal(self, source, target):
+        return can_move(self.pegs, source, target)
+
+    def legal_moves(self):
+        return legal_moves(self.pegs)
+
+    def apply(self, source, target):
+        if not can_move(self.pegs, source, target):
+            raise IllegalMove(f"Cant move from peg {source} to peg {target}")
+        bit = step(self.pegs, source, target)
+        self.history.append((source, target))
+        self.moves += 1
+        return bit.bit_length() # the ring that moved
+
+    def undo(self):
+        if not self.history:
+            raise IndexError("Nothing to undo")
+        source, target = self.history.pop()
+        pegs = self.pegs
+        dst = pegs[target]
+        bit = dst & -dst
+        pegs[target] = dst ^ bit
+        pegs[source] |= bit
+        self.moves -= 1
+        return source, target
+
+    def is_solved(self, target=None): # everything on the last peg by default, like the game
+        if target is None:
+            target = len(self.pegs) - 1
+        return self.pegs[target] == self.full
+
+    def peg_lists(self): # bottom to top, biggest ring first
+        return [[ring for ring in range(self.rings, 0, -1) if mask & (1 << (ring - 1))] for mask in self.pegs]
+
+    def __eq__(self, other):
+        return isinstance(other, HanoiState) and self.pegs == other.pegs
+
+    def __repr__(self):
+        return f"HanoiState({self.peg_lists()})"
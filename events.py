@@ -0,0 +1,50 @@
+from bisect import bisect_right
+
+import pygame
+
+# input dispatch, a scene registers handlers per event type and each event only
+# reaches the handlers for its type, so a frame costs O(events) however many
+# towers, buttons or bot generated clicks there are
+
+
+class EventRouter:
+    def __init__(self):
+        self.handlers = {} # event type -> [handler(event)]
+
+    def on(self, event_type, handler):
+        self.handlers.setdefault(event_type, []).append(handler)
+        return handler
+
+    def off(self, event_type, handler):
+        handlers = self.handlers.get(event_type)
+        if handlers and handler in handlers:
+            handlers.remove(handler)
+
+    def dispatch(self, events):
+        if not events: # most frames, skips making an iterator
+            return
+        handlers = self.handlers
+        for event in events:
+            for handler in handlers.get(event.type, ()):
+                handler(event)
+
+
+class HitIndex:
+    # which rect of a row of side by side rects (tower hitboxes) a point is in
+    # binary search over the left edges for x, then a single y check
+    # the rects are copied, build a new index if they move
+    def __init__(self, rects):
+        order = sorted(range(len(rects)), key=lambda i: rects[i].left)
+        self.ids = order # sorted position -> index in the rects given
+        self.rects = [pygame.Rect(rects[i]) for i in order]
+        self.lefts = [rect.left for rect in self.rects]
+        for a, b in zip(self.rects, self.rects[1:]):
+            if a.right > b.left:
+                raise ValueError("Hitboxes overlap")
+
+    def find(self, pos): # index of the rect under pos, None if there isnt one
+        x, y = pos
+        i = bisect_right(self.lefts, x) - 1
+        if i >= 0 and self.rects[i].collidepoint(x, y):
+            return self.ids[i]
+        return None
@@ -1,12 +1,71 @@
 import pygame
 from stack import Stack
-from random import randint
+import assets
+from engine import HanoiState
+import solver
+import puzzles
+from puzzles import DEFAULT_DIFFICULTY
+from events import HitIndex
+from replay import Replay
 import os
 
 WIDTH, HEIGHT = 570, 700
 
+CLASSIC_RINGS = 9 # one drawn cat each, bigger games get generated sprites
+RING_BOTTOM = HEIGHT - 40 # bottom edge of the lowest cat
+RING_TOP = 150 # the top cat of a full tower stays under the hud
+FONT = "font/arcade_bold.ttf"
+
+_sprites = assets.track({}) # (value, rings) -> generated ring sprite, the only copy kept
+_overlays = {} # (size, colour) -> translucent highlight
+
+SELECTED = (255, 255, 255, 128)
+HINT_SOURCE = (255, 160, 160, 140) # source a bit stronger than the target
+HINT_TARGET = (255, 160, 160, 70)
+
+
+def ring_metrics(rings): # (ring height, px between ring slots), the classic 60 and 50 up to 10 rings
+    if rings <= CLASSIC_RINGS:
+        return 60, 50
+    # h + (rings - 1) * step fills the column, h keeps the classic 6:5 to step
+    step = min(50, (RING_BOTTOM - RING_TOP) / (rings + 0.2))
+    return max(3, round(step * 1.2)), step
+
+
+def ring_image(value, rings):
+    if rings <= CLASSIC_RINGS:
+        return assets.scaled(f"images/game/cats/cat{value}.png", (130, 60))
+    key = (value, rings)
+    surface = _sprites.get(key)
+    if surface is None:
+        # one of the nine cats stretched to a width by size like real hanoi disks,
+        # tinted around the colour wheel so neighbours dont look alike
+        height, _ = ring_metrics(rings)
+        width = round(40 + 110 * (value - 1) / (rings - 1))
+        tint = pygame.Color(0)
+        tint.hsva = (value * 137.5 % 360, 45, 100, 100)
+        surface = assets.tinted(f"images/game/cats/cat{(value - 1) % CLASSIC_RINGS + 1}.png", (width, height), tint)
+        if height >= 16: # the number painted on the cat is wrong past 9, write the real one when it fits
+            label = assets.font(FONT, height - 4).render(str(value), True, (20, 20, 20))
+            badge = label.get_rect(center=surface.get_rect().center)
+            pygame.draw.rect(surface, (255, 255, 255), badge.inflate(8, 0), border_radius=height // 2)
+            surface.blit(label, badge)
+        if pygame.display.get_surface() is None:
+            return surface
+        _sprites[key] = surface
+    return surface
+
+
+def overlay(size, colour): # highlights get blitted every redraw, made once per size and colour
+    key = (size, colour)
+    surface = _overlays.get(key)
+    if surface is None:
+        surface = _overlays[key] = pygame.Surface(size, pygame.SRCALPHA)
+        surface.fill(colour)
+    return surface
+
 class Hanoi:
-    def __init__(self, game, towers, rings=3, shuffled=False):
+    def __init__(self, game, towers, rings=3, shuffled=False, difficulty=DEFAULT_DIFFICULTY):
         self.game = game
         self.screen = game.screen
         self.towers = towers
@@ -16,113 +75,231 @@ class Hanoi:
         self.pause = False
         self.selected = None
 
-        print(shuffled)
+        # the rules live in the headless engine, towers and rings just show its state
         if not shuffled:
-            for val in range(rings, 0, -1):
-                ring = Ring(self.screen, val, self.towers.index(0))
-                self.start.insert(ring)
-            self.towers.index(0).stack = self.start.copy()
-        else:
-            for val in range(rings, 0, -1):
-                ring = Ring(self.screen, val, self.towers.index(0))
-                self.start.insert(ring)
+            self.state = HanoiState(rings)
+        else: # random board with a controlled optimal distance to the goal
+            self.state = puzzles.generate(rings, difficulty)
 
-            for ring in self.start:
-                tower = self.towers.index(randint(0, 2))
+        rings_by_value = {}
+        for val in range(rings, 0, -1):
+            ring = Ring(self.screen, val, self.towers.index(0), rings)
+            rings_by_value[val] = ring
+            self.start.insert(ring)
+        for tower, peg in zip(self.towers, self.state.peg_lists()):
+            for val in peg:
+                ring = rings_by_value[val]
                 ring.tower = tower
                 tower.stack.insert(ring)
-        print(self.towers.index(0).stack)
-        self.moves = 0
-        self.min_moves = (2 ** rings) - 1  # FORMULA
+        # every tower keeps its pole and cats drawn on one surface, a move patches two slots
+        # so a frame costs the same with 3 cats or 64
+        height, step = ring_metrics(rings)
+        top = RING_BOTTOM - height - (rings - 1) * step
+        for tower in self.towers:
+            tower.build(height, step, top)
+        # the scene has placed the towers already and they dont move, clicks map to one by its x
+        self.hitboxes = HitIndex([tower.hitbox_rect for tower in self.towers])
+        size = self.towers.index(0).hitbox_rect.size
+        self.overlays = {name: overlay(size, colour) for name, colour in
+                         (('selected', SELECTED), ('source', HINT_SOURCE), ('target', HINT_TARGET))}
+        self.min_moves = solver.distance(self.state) # 2**rings - 1 for a normal start
+        self.replay = Replay(rings, puzzles.state_index(self.state), shuffled) # every committed move, timed
         self.time = 0  # round(self.min_moves * 1.5)
 
-    def update(self, events):
-        for i in self.towers:
-            if i == self.selected:
-                #Using surface for SRCALPHA instead of Rect, this is to manipulate the opacity
-                hitbox_surface = pygame.Surface((i.hitbox_rect.width, i.hitbox_rect.height), pygame.SRCALPHA)
-                # Fill the surface with a semi-transparent color
-                hitbox_surface.fill((255, 255, 255, 128))
-                # Blit the surface onto the screen at the position of the hitbox
-                self.screen.blit(hitbox_surface, i.hitbox_rect.topleft)
-            i.update()
+        self.hint = None # (source, target) tower indexes of the suggested move
+        self.hints = 0
+        self.autoplay = False
+        self.autoplay_delay = 0.25 # seconds between autoplay moves
+        self.autoplay_timer = 0
+        self.autoplay_moves = None # lazy solver sequence, rebuilt if the player moves
+        self.assisted = False # autoplay was used
+
+    @property
+    def moves(self):
+        return self.state.moves
 
+    def update(self): # clock and autoplay, clicks come in through click()
         if not self.pause:
             self.time += self.game.delta
-            for event in events:
-                for tower in self.towers:
-                    if event.type == pygame.MOUSEBUTTONUP and tower.hitbox_rect.collidepoint(
-                            pygame.mouse.get_pos()) and self.selected is None and len(tower.stack) != 0:
-                        self.selected = tower
-                        self.game.sfx['select'].play()
-                    elif event.type == pygame.MOUSEBUTTONUP and tower.hitbox_rect.collidepoint(
-                            pygame.mouse.get_pos()) and self.selected is not None:
-                        if len(tower.stack) == 0:
-                            ring = self.selected.stack.get()
-                            ring.tower = tower
-                            tower.stack.insert(ring)
-                            self.game.sfx['meow'].play()
-
-                        elif tower.stack.getLast().value > self.selected.stack.getLast().value:
-                            ring = self.selected.stack.get()
-                            ring.tower = tower
-                            tower.stack.insert(ring)
-                            self.game.sfx['meow'].play()
-
-                        else:
-                            self.selected = None
-                            self.game.sfx['wrong'].play()
-                            continue
-
-                        self.selected = None
-                        self.moves += 1
+            if self.autoplay:
+                self.play_solution(self.game.delta)
+
+    def click(self, event): # MOUSEBUTTONUP handler, uses where the click happened, not where the mouse is now
+        if self.pause:
+            return
+        target = self.hitboxes.find(event.pos)
+        if target is None:
+            return
+        tower = self.towers.index(target)
+        if self.selected is None:
+            if len(tower.stack) != 0:
+                self.select(tower)
+                self.game.sfx['select'].play()
+            return
+        source = self.towers.getIndex(self.selected)
+        if self.state.legal(source, target):
+            self.state.apply(source, target)
+            self.replay.record(source, target, self.time)
+            self.move(self.selected, tower)
+            self.autoplay_moves = None
+            self.select(None)
+        else:
+            self.select(None)
+            self.game.sfx['wrong'].play()
+
+    def draw(self): # only the towers inside the renderer's dirty regions get redrawn
+        renderer = self.game.renderer
+        if not renderer.regions(): # idle frame, nothing to do and nothing allocated
+            return
+        for i in self.towers:
+            for _ in renderer.clips(i.area()):
+                if i == self.selected:
+                    # preallocated SRCALPHA surfaces instead of a Rect, for the opacity
+                    self.screen.blit(self.overlays['selected'], i.hitbox_rect)
+                if self.hint and self.towers.getIndex(i) in self.hint:
+                    source = self.towers.getIndex(i) == self.hint[0]
+                    self.screen.blit(self.overlays['source' if source else 'target'], i.hitbox_rect)
+                i.update()
+
+    def show_hint(self): # highlights the optimal next move until a move is made
+        move = solver.next_move(self.state)
+        if move is None:
+            return
+        self.hints += 1
+        self.set_hint(move)
+
+    def set_hint(self, hint):
+        for move in (self.hint, hint):
+            if move:
+                self.game.renderer.dirty(*(self.towers.index(i).area() for i in move))
+        self.hint = hint
+
+    def set_autoplay(self, on):
+        self.autoplay = on
+        self.autoplay_timer = 0
+        self.autoplay_moves = None
+        if on:
+            self.assisted = True
+            self.select(None)
+
+    def play_solution(self, delta):
+        self.autoplay_timer += delta
+        while self.autoplay_timer >= self.autoplay_delay:
+            self.autoplay_timer -= self.autoplay_delay
+            if self.autoplay_moves is None:
+                self.autoplay_moves = solver.solution(self.state)
+            move = next(self.autoplay_moves, None)
+            if move is None:
+                self.set_autoplay(False)
+                return
+            self.state.apply(*move)
+            self.replay.record(*move, self.time)
+            self.move(self.towers.index(move[0]), self.towers.index(move[1]))
+
+    def select(self, tower):
+        for i in (self.selected, tower):
+            if i is not None:
+                self.game.renderer.dirty(i.area())
+        self.selected = tower
+
+    def move(self, source, target): # moves the top sprite, the engine already applied the move
+        target.push(source.pop())
+        # only the two towers involved change
+        self.game.renderer.dirty(source.area(), target.area())
+        self.set_hint(None)
+        self.game.sfx['meow'].play()
 
 
 class Tower:
+    __slots__ = ('screen', 'stack', 'image', 'image_rect', 'hitbox_rect', 'ring_height', 'step', 'rect', 'surface')
+
     def __init__(self, screen, stack):
         self.screen = screen
         self.stack = stack
-        self.image = pygame.image.load('images/game/tower.png')
+        self.image = assets.image('images/game/tower.png') # shared by every tower, only the rects are per tower
         self.image_rect = self.image.get_rect()
         self.hitbox_rect = pygame.Rect(self.image_rect.x, self.image_rect.y, 175, self.image_rect.height)
+        self.ring_height, self.step = ring_metrics(CLASSIC_RINGS)
+        self.rect = None # screen area of the cached surface
+        self.surface = None # the pole with its cats, patched when a cat comes or goes
+
+    def build(self, ring_height, step, top): # call once the towers are placed and the stack filled
+        self.ring_height, self.step = ring_height, step
+        self.rect = self.hitbox_rect.union((self.hitbox_rect.x, top, self.hitbox_rect.width, 1))
+        self.surface = pygame.Surface(self.rect.size, pygame.SRCALPHA)
+        self.layout()
+        self.repaint(self.rect)
+
+    def layout(self): # recompute cached ring positions
+        for index, ring in enumerate(self.stack):
+            ring.place(index)
+
+    def slot(self, index): # y of the cat at this stack position, 0 is the bottom
+        return round(RING_BOTTOM - self.ring_height - index * self.step)
+
+    def repaint(self, rect): # redraws a screen rect of the cached surface, only the cats crossing it
+        surface = self.surface
+        local = rect.move(-self.rect.x, -self.rect.y)
+        surface.fill((0, 0, 0, 0), local)
+        surface.set_clip(local)
+        surface.blit(self.image, (self.image_rect.x - self.rect.x, self.image_rect.y - self.rect.y))
+        # stack positions whose slot can reach the rect, top first so lower cats overlap the ones above
+        base = RING_BOTTOM - self.ring_height
+        low = max(0, int((base - rect.bottom) / self.step))
+        high = min(len(self.stack) - 1, int((base + self.ring_height - rect.top) / self.step) + 1)
+        for index in range(high, low - 1, -1):
+            ring = self.stack.index(index)
+            if ring.image_rect.colliderect(rect):
+                surface.blit(ring.image, (ring.image_rect.x - self.rect.x, ring.image_rect.y - self.rect.y))
+        surface.set_clip(None)
+
+    def push(self, ring):
+        ring.tower = self
+        self.stack.insert(ring)
+        ring.place(len(self.stack) - 1)
+        self.repaint(ring.image_rect)
+
+    def pop(self):
+        ring = self.stack.get()
+        self.repaint(ring.image_rect) # the stack no longer has it, so its slot clears
+        return ring
+
+    def area(self): # everything this tower draws on
+        if self.rect is None:
+            return self.hitbox_rect.unionall([ring.image_rect for ring in self.stack])
+        return self.rect
 
     def update(self):
-        self.screen.blit(self.image, pos(self.image_rect))
-        for i in self.stack.inverse():
-            i.update()
+        if self.surface is None:
+            self.screen.blit(self.image, pos(self.image_rect))
+            for i in self.stack.inverse():
+                i.update()
+            return
+        self.screen.blit(self.surface, self.rect)
 
 
 class Ring:
-    def __init__(self, screen, value, tower):
-        self.screen = screen
+    # a big tower is up to 64 of these, the sprite is shared from the caches and the
+    # screen comes from the tower, so a ring is just its value, tower and rect
+    __slots__ = ('tower', 'value', 'image', 'image_rect')
+
+    def __init__(self, screen, value, tower, rings=CLASSIC_RINGS):
         self.tower = tower
         self.value = value
-        image = pygame.image.load(f"images/game/cats/cat{self.value}.png")
-        self.image = scale(image, (130, 60))
+        self.image = ring_image(value, rings)
         self.image_rect = self.image.get_rect()
 
-    def update(self):
-        self.image_rect.x, self.image_rect.y = self.tower.image_rect.x - (self.image_rect.width // 2 - self.tower.image_rect.width // 2), HEIGHT - (
-                    self.tower.stack.getIndex(self) * (self.image_rect.height - 10)) - 100
+    def place(self, index): # index is the position in the tower's stack, 0 is the bottom
+        self.image_rect.x, self.image_rect.y = self.tower.image_rect.x - (self.image_rect.width // 2 - self.tower.image_rect.width // 2), self.tower.slot(index)
 
-        self.screen.blit(self.image, pos(self.image_rect))
+    def update(self):
+        self.tower.screen.blit(self.image, pos(self.image_rect))
 
 
 def pos(rect):
     return rect.x, rect.y
 
 
-def scale(image, size):
-    w, h = image.get_size()
-    sc = min(size[0] / w, size[1] / h)
-
-    new_w = int(w * sc)
-    new_h = int(h * sc)
-
-    new_image = pygame.transform.scale(image, (new_w, new_h))
-    return new_image
-
-
 if __name__ == '__main__':
     os.system('cls')
     os.system('py main.py')
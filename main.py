@@ -1,21 +1,41 @@
+import startup # first, so it can time the imports below
+startup.report.track_imports()
 import pygame
 import pygame_widgets
-from pygame_widgets.slider import Slider
 from pygame_widgets.button import Button
-from pygame_widgets.toggle import Toggle
-from pygame_widgets.textbox import TextBox
+# sliders, toggles, text boxes and the game itself are imported by the scenes that use them
 
-from hanoi import Hanoi, Tower, scale
+from puzzles import DEFAULT_DIFFICULTY
 from stack import Stack
 
-from tree import BinaryTree
-
+from tree import Leaderboards
+from store import ScoreStore
+import assets
+from render import Renderer
+from clock import FrameClock
+from audio import Music, SoundEffects
+from writer import BackgroundWriter, atomic_write_json
+from events import EventRouter
+from profiler import Profiler, TOGGLE_KEY, DUMP_KEY
+import memory
+import scoring
+
+import argparse
+import gc
 import json
+from collections import OrderedDict
 import os
+import threading
+import time
+import traceback
+import warnings
+from concurrent.futures import ThreadPoolExecutor
 
 from abc import ABC, abstractmethod
 
-pygame.init()
+startup.report.stop_imports()
+with startup.report.stage('pygame.init'):
+    pygame.init()
 WIDTH, HEIGHT = 570, 700
 inactive = (255, 220, 220)
 hover = (255, 190, 190)
@@ -36,6 +56,8 @@ font_san = "font/arcade.ttf"
 pygame.display.set_caption("Tower of Cats")
 
 class Scene(ABC):
+    pooled = False # kept by the scene manager and reused instead of rebuilt
+
     @abstractmethod
     def run(self, events): # executes
         pass
@@ -44,55 +66,139 @@ class Scene(ABC):
     def destroy(self): # destroy any widget
         pass
 
+    def all_widgets(self):
+        return []
+
+    def next_scenes(self): # scenes worth building in the background while this one is up
+        return ()
+
+    @classmethod
+    def prefetch(cls, game): # slow data loading for a build, the preload thread runs it without the scene lock
+        pass
+
+    # pooled scenes are suspended instead of destroyed, their widgets just leave the handler
+    def suspend(self):
+        for widget in self.all_widgets():
+            reset_widget(widget)
+            pygame_widgets.WidgetHandler().removeWidget(widget)
+
+    def resume(self, **kwargs):
+        for widget in self.all_widgets():
+            pygame_widgets.WidgetHandler().addWidget(widget)
+
+def reset_widget(widget): # drop a half finished click so it cant fire after a resume
+    if isinstance(widget, Button):
+        widget.clicked = False
+        widget.colour = widget.inactiveColour
+        widget.borderColour = widget.inactiveBorderColour
+    elif hasattr(widget, 'selected'): # a slider mid drag, a focused text box
+        widget.selected = False
+
 class SceneManager:
-    def __init__(self, scene):
+    def __init__(self, scene, renderer=None, game=None):
         self.__scene = scene
+        self.renderer = renderer
+        self.game = game
+        self.pool = {} # scene class -> its one reusable instance
+        self.loading = set() # classes the preload thread still has to build
+        self.lock = threading.Lock() # held by the main loop for the frame and by the preload thread per build
+        self.idle_delay = 0.5 # seconds the new scene gets before the preload thread starts building
     
     def get_scene(self):
         return self.__scene
     
     def set_scene(self, scene):
-        if self.__scene:
-            self.__scene.destroy()
+        old = self.__scene
+        if old and old is not scene:
+            memory.report.snapshot(type(old).__name__) # no-op unless --memory-report
+            if self.pool.get(type(old)) is old:
+                old.suspend()
+            else:
+                old.destroy()
         self.__scene = scene
+        if self.renderer:
+            self.renderer.invalidate() # new scene draws everything
+        if scene:
+            self.preload(*scene.next_scenes())
+
+    def open(self, cls, **kwargs): # switch to a pooled scene, only built the first time
+        scene = self.pool.get(cls)
+        if scene is None:
+            scene = cls(self.game, **kwargs)
+            if cls.pooled:
+                self.pool[cls] = scene
+        else:
+            scene.resume(**kwargs)
+        self.set_scene(scene)
+
+    def preload(self, *scenes):
+        wanted = [cls for cls in scenes if cls.pooled and cls not in self.pool and cls not in self.loading]
+        if not wanted or self.game is None:
+            return
+        self.loading.update(wanted)
+        threading.Thread(target=self._build, args=(wanted,), name='preload', daemon=True).start()
+
+    def _build(self, scenes):
+        time.sleep(self.idle_delay)
+        for cls in scenes:
+            try:
+                cls.prefetch(self.game) # while the main loop keeps running
+                with self.lock: # widgets and the asset caches arent thread safe, build between frames
+                    if cls not in self.pool:
+                        scene = cls(self.game)
+                        scene.suspend()
+                        self.pool[cls] = scene
+            except Exception:
+                traceback.print_exc() # it just gets built on first use instead
+            finally:
+                self.loading.discard(cls)
     
     def update(self, events):
         self.__scene.run(events)
 
 class MainMenu(Scene):
+    pooled = True
+
     def __init__(self, game):
         self.game = game
         self.screen = game.screen
-        self.font = pygame.font.Font(font_bold, 48)
+        self.font = assets.font(font_bold, 48)
         #self.title = self.font.render("Tower of Cats", True, font_color)
         # colors
 
         #x,y,width,height
         self.buttons = [
-            Button(self.game.screen, WIDTH / 2 - 125, 315, 250, 75, font=pygame.font.Font(font_bold, 40), borderThickness=5, inactiveColour=inactive, hoverColour=hover,pressedColour=click, inactiveBorderColour=border_inactive,hoverBorderColour=border_hover,pressedBorderColour=border_click,radius=50, text='Play', onRelease=lambda:self.switch('play')),
-            Button(self.screen, WIDTH / 2 - 125, 385+ 20, 250, 75, font=pygame.font.Font(font_bold, 25), borderThickness=5, inactiveColour=inactive, hoverColour=hover,pressedColour=click, inactiveBorderColour=border_inactive,hoverBorderColour=border_hover,pressedBorderColour=border_click, radius=50, text="Leaderboard", onRelease=lambda:self.switch('leaderboard')),
-            Button(self.screen, WIDTH / 2 - 125, 415 + 80, 250, 75, font=pygame.font.Font(font_bold, 38), borderThickness=5, inactiveColour=inactive, hoverColour=hover,pressedColour=click, inactiveBorderColour=border_inactive,hoverBorderColour=border_hover,pressedBorderColour=border_click, radius=50, text="Settings", onRelease=lambda:self.switch('settings')),
-            Button(self.screen, WIDTH / 2 - 125, 515 + 73, 250, 75, font=pygame.font.Font(font_bold, 45),borderThickness=5, inactiveColour=inactive, hoverColour=hover,pressedColour=click, inactiveBorderColour=border_inactive,hoverBorderColour=border_hover,pressedBorderColour=border_click, radius=50, text="Quit",  onRelease=lambda:self.switch('quit'),)
+            Button(self.game.screen, WIDTH / 2 - 125, 315, 250, 75, font=assets.font(font_bold, 40), borderThickness=5, inactiveColour=inactive, hoverColour=hover,pressedColour=click, inactiveBorderColour=border_inactive,hoverBorderColour=border_hover,pressedBorderColour=border_click,radius=50, text='Play', onRelease=lambda:self.switch('play')),
+            Button(self.screen, WIDTH / 2 - 125, 385+ 20, 250, 75, font=assets.font(font_bold, 25), borderThickness=5, inactiveColour=inactive, hoverColour=hover,pressedColour=click, inactiveBorderColour=border_inactive,hoverBorderColour=border_hover,pressedBorderColour=border_click, radius=50, text="Leaderboard", onRelease=lambda:self.switch('leaderboard')),
+            Button(self.screen, WIDTH / 2 - 125, 415 + 80, 250, 75, font=assets.font(font_bold, 38), borderThickness=5, inactiveColour=inactive, hoverColour=hover,pressedColour=click, inactiveBorderColour=border_inactive,hoverBorderColour=border_hover,pressedBorderColour=border_click, radius=50, text="Settings", onRelease=lambda:self.switch('settings')),
+            Button(self.screen, WIDTH / 2 - 125, 515 + 73, 250, 75, font=assets.font(font_bold, 45),borderThickness=5, inactiveColour=inactive, hoverColour=hover,pressedColour=click, inactiveBorderColour=border_inactive,hoverBorderColour=border_hover,pressedBorderColour=border_click, radius=50, text="Quit",  onRelease=lambda:self.switch('quit'),)
         ]
         
         self.mouse = pygame.mouse
 
-        self.bg_image = pygame.image.load("images/game/backgrounds/menu_bg.png")
+        self.bg_image = assets.background("images/game/backgrounds/menu_bg.png")
         self.bg_rect = self.bg_image.get_rect(topleft=(0, 0))
 
     def switch(self, scene):
         self.game.sfx['button'].play()
         if scene == 'play':
-            self.game.gamescene.set_scene(GameSelection(game))
+            self.game.gamescene.open(GameSelection)
         elif scene == 'leaderboard':
-            self.game.gamescene.set_scene(Leaderboard(game))
+            self.game.gamescene.open(Leaderboard)
         elif scene == 'settings':
-            self.game.gamescene.set_scene(Settings(game))
+            self.game.gamescene.open(Settings)
         elif scene == 'quit':
             self.game.quit()
 
+    def next_scenes(self):
+        return (GameSelection, Settings, Leaderboard)
+
+    def all_widgets(self):
+        return self.buttons
+
     def run(self, events):
-        self.screen.blit(self.bg_image, self.bg_rect.topleft)
+        self.game.renderer.widgets(self.buttons)
+        self.game.renderer.restore(self.bg_image, self.bg_rect.topleft)
         #self.screen.blit(self.title, (WIDTH / 2 - self.title.get_width() / 2, 100))
 
     def destroy(self):
@@ -100,7 +206,10 @@ class MainMenu(Scene):
             pygame_widgets.WidgetHandler().removeWidget(i)
 
 class Settings(Scene):
+    pooled = True
+
     def __init__(self, game):
+        from pygame_widgets.slider import Slider
         self.game = game
         self.screen = game.screen
 
@@ -108,108 +217,123 @@ class Settings(Scene):
         self.widgets = {
             "bgm": Slider(self.screen, WIDTH // 2 - 400 // 2 - 20, 340, 380, 33, min=0, max=100, initial=100, handleRadius=15),
             "sfx": Slider(self.screen, WIDTH // 2 - 400 // 2 - 20, 460, 380, 33, min=0, max=100, initial=100, handleRadius=15),
-            "back": Button(self.screen, center - 200 / 2, HEIGHT - 150, 200, 100,font=pygame.font.Font(font_bold, 52),borderThickness=5, inactiveColour=inactive, hoverColour=hover,pressedColour=click, inactiveBorderColour=border_inactive,hoverBorderColour=border_hover,pressedBorderColour=border_click, text="Back", fontSize=64, onClick=self.back, radius=100 // 2)
+            "back": Button(self.screen, center - 200 / 2, HEIGHT - 150, 200, 100,font=assets.font(font_bold, 52),borderThickness=5, inactiveColour=inactive, hoverColour=hover,pressedColour=click, inactiveBorderColour=border_inactive,hoverBorderColour=border_hover,pressedBorderColour=border_click, text="Back", fontSize=64, onClick=self.back, radius=100 // 2)
         }
         
-        fontLabel = pygame.font.Font(font_bold, 32)
-        title = pygame.font.Font(font_bold, 56)
+        fontLabel = assets.font(font_bold, 32)
+        title = assets.font(font_bold, 56)
 
-        self.bgm_label = fontLabel.render("Background Music", True, font_color)
-        self.sfx_label = fontLabel.render("Sound Effects", True, font_color)
-        self.settings_title = title.render("Settings", True, font_color)
+        self.bgm_label = assets.text(fontLabel, "Background Music", font_color)
+        self.sfx_label = assets.text(fontLabel, "Sound Effects", font_color)
+        self.settings_title = assets.text(title, "Settings", font_color)
 
-        self.font = pygame.font.Font(font_bold, 20)
+        self.font = assets.font(font_bold, 20)
 
         self.open()
         
-        self.bg_image = pygame.image.load("images/game/backgrounds/gselect_bg.png")
+        self.bg_image = assets.background("images/game/backgrounds/gselect_bg.png")
         self.bg_rect = self.bg_image.get_rect(topleft=(0, 0))
     
     def run(self, events):
-        self.screen.blit(self.bg_image, self.bg_rect.topleft)
-        
-        self.screen.blit(self.bgm_label, (WIDTH / 2 - self.bgm_label.get_width() / 2, 280))
-        self.screen.blit(self.sfx_label, (WIDTH / 2 - self.sfx_label.get_width() / 2, 400))
-        self.screen.blit(self.settings_title, (WIDTH / 2 - self.settings_title.get_width() / 2, 100))
-
+        renderer = self.game.renderer
         # Draw slider values
-        bgm_value_text = self.font.render(f"{self.widgets['bgm'].getValue()}", True, font_color)
-        sfx_value_text = self.font.render(f"{self.widgets['sfx'].getValue()}", True, font_color)
+        bgm_value_text = assets.text(self.font, f"{self.widgets['bgm'].getValue()}", font_color)
+        sfx_value_text = assets.text(self.font, f"{self.widgets['sfx'].getValue()}", font_color)
+        renderer.label('bgm', bgm_value_text, (WIDTH // 2 - 400 // 2 + 395, 345))
+        renderer.label('sfx', sfx_value_text, (WIDTH // 2 - 400 // 2 + 395, 465))
+        renderer.widgets(self.widgets.values())
 
-        self.screen.blit(bgm_value_text, (WIDTH // 2 - 400 // 2 + 395, 345))
-        self.screen.blit(sfx_value_text, (WIDTH // 2 - 400 // 2 + 395, 465))
+        renderer.restore(self.bg_image, self.bg_rect.topleft)
+        
+        renderer.blit(self.bgm_label, (WIDTH / 2 - self.bgm_label.get_width() / 2, 280))
+        renderer.blit(self.sfx_label, (WIDTH / 2 - self.sfx_label.get_width() / 2, 400))
+        renderer.blit(self.settings_title, (WIDTH / 2 - self.settings_title.get_width() / 2, 100))
+
+        renderer.blit(bgm_value_text, (WIDTH // 2 - 400 // 2 + 395, 345))
+        renderer.blit(sfx_value_text, (WIDTH // 2 - 400 // 2 + 395, 465))
         
         # Update the widgets
         for widget in self.widgets.values():
             widget.draw()
     
     def open(self):
-        if not os.path.exists('settings.json'):
-            with open('settings.json', 'w+') as file:
-                file.write('{"bgm": 100, "sfx": 100}')
-        with open('settings.json', 'r+') as file:
-            data = json.load(file)
+        data = self.game.volume # kept in sync with what the writer is putting on disk
         self.widgets['bgm'].setValue(data['bgm'])
         self.widgets['sfx'].setValue(data['sfx'])
     
     def back(self):
         data = {"bgm": self.widgets['bgm'].getValue(), "sfx": self.widgets['sfx'].getValue()}
-        with open('settings.json', 'w+') as file:
-            json.dump(data, file)
+        self.game.volume = data
+        self.game.writer.write_json('settings.json', data) # atomic, off the render thread
         
         self.game.bgm.set_volume(data['bgm'] / 100)  # Change volume
-        for sound in self.game.sfx.values():
-            sound.set_volume(data['sfx']/100)
-        self.game.gamescene.set_scene(MainMenu(self.game))  # Change scene
+        self.game.sfx.set_volume(data['sfx'] / 100)
+        self.game.gamescene.open(MainMenu)  # Change scene
+
+    def resume(self, **kwargs):
+        super().resume()
+        self.open()
+
+    def all_widgets(self):
+        return self.widgets.values()
     
     def destroy(self):
         for key, stat in self.widgets.items():
             pygame_widgets.WidgetHandler().removeWidget(stat)
 
 class GameSelection(Scene):
+    pooled = True # keeps the last picked cats and shuffle
+
     def __init__(self, game):
+        from pygame_widgets.slider import Slider
+        from pygame_widgets.toggle import Toggle
+        from engine import MAX_RINGS
         self.game = game
         self.screen = game.screen
 
         # Initialize fonts
-        self.fontLabel = pygame.font.Font(font_bold, 32)
-        self.font = pygame.font.Font(font_bold, 15)
-        title = pygame.font.Font(font_bold, 52)
+        self.fontLabel = assets.font(font_bold, 32)
+        self.font = assets.font(font_bold, 15)
+        title = assets.font(font_bold, 52)
 
         # Initialize texts
-        self.slider_text = self.fontLabel.render("Number of Cats:", True, font_color)
-        self.toggle_text = self.fontLabel.render("Shuffle Mode", True, font_color)
-        self.gameselection_title = title.render("Game Setup", True, font_color)
+        self.slider_text = assets.text(self.fontLabel, "Number of Cats:", font_color)
+        self.toggle_text = assets.text(self.fontLabel, "Shuffle Mode", font_color)
+        self.gameselection_title = assets.text(title, "Game Setup", font_color)
 
         # Initialize widgets
         center = WIDTH / 2
         self.widgets = {
-            "slider": Slider(self.screen, WIDTH // 2 - 260 // 2, 280, 260, 15,colour=(255,255,255),handleColour=click, min=3, max=9, handleRadius=30, initial=3, step=0.01),
+            "slider": Slider(self.screen, WIDTH // 2 - 260 // 2, 280, 260, 15,colour=(255,255,255),handleColour=click, min=3, max=MAX_RINGS, handleRadius=30, initial=3, step=0.01),
             "toggle": Toggle(self.screen, WIDTH // 2 - 75 // 2, 410, 75, 50, handleRadius=25, handleOnColour=border_click,handleOffColour=border_inactive,onColour=inactive,offColour=click),
-            "back": Button(self.screen, center / 2 - 260 / 2, 550, 260, 110,font=pygame.font.Font(font_bold, 52),borderThickness=5, inactiveColour=inactive, hoverColour=hover,pressedColour=click, inactiveBorderColour=border_inactive,hoverBorderColour=border_hover,pressedBorderColour=border_click, radius=50, text="Back", fontSize=64, onRelease=lambda: self.switch('back')),
-            "play": Button(self.screen, (center + center / 2) - 260 / 2, 550, 260, 110,font=pygame.font.Font(font_bold, 52),borderThickness=5, inactiveColour=inactive, hoverColour=hover,pressedColour=click, inactiveBorderColour=border_inactive,hoverBorderColour=border_hover,pressedBorderColour=border_click, radius=50, text="Play", fontSize=64, onRelease=lambda: self.switch('play'))
+            "back": Button(self.screen, center / 2 - 260 / 2, 550, 260, 110,font=assets.font(font_bold, 52),borderThickness=5, inactiveColour=inactive, hoverColour=hover,pressedColour=click, inactiveBorderColour=border_inactive,hoverBorderColour=border_hover,pressedBorderColour=border_click, radius=50, text="Back", fontSize=64, onRelease=lambda: self.switch('back')),
+            "play": Button(self.screen, (center + center / 2) - 260 / 2, 550, 260, 110,font=assets.font(font_bold, 52),borderThickness=5, inactiveColour=inactive, hoverColour=hover,pressedColour=click, inactiveBorderColour=border_inactive,hoverBorderColour=border_hover,pressedBorderColour=border_click, radius=50, text="Play", fontSize=64, onRelease=lambda: self.switch('play'))
         }
 
         # Create an initial text for slider value
         self.update_slider_value()
 
-        self.bg_image = pygame.image.load("images/game/backgrounds/gselect_bg.png")
+        self.bg_image = assets.background("images/game/backgrounds/gselect_bg.png")
         self.bg_rect = self.bg_image.get_rect(topleft=(0, 0))
 
     def update_slider_value(self):
         value = round(self.widgets['slider'].getValue())
-        self.slider_value_text = self.fontLabel.render(str(value), True, font_color) 
+        self.slider_value_text = assets.text(self.fontLabel, str(value), font_color)
 
     def run(self, events):
-        self.screen.blit(self.bg_image, self.bg_rect.topleft)
-        
-        self.screen.blit(self.gameselection_title, (WIDTH / 2 - self.gameselection_title.get_width() / 2, 60))
-        self.screen.blit(self.slider_text, (WIDTH / 2 - self.slider_text.get_width() / 2 - 25, 200))
-        self.screen.blit(self.toggle_text, (WIDTH / 2 - self.toggle_text.get_width() / 2, 360))
-
+        renderer = self.game.renderer
         # Update and draw slider value text
         self.update_slider_value()
-        self.screen.blit(self.slider_value_text, (WIDTH / 2 + 260 // 2 - self.slider_value_text.get_width() + 52, 200))
+        value_pos = (WIDTH / 2 + 260 // 2 - self.slider_value_text.get_width() + 52, 200)
+        renderer.label('slider', self.slider_value_text, value_pos)
+        renderer.widgets(self.widgets.values())
+
+        renderer.restore(self.bg_image, self.bg_rect.topleft)
+        
+        renderer.blit(self.gameselection_title, (WIDTH / 2 - self.gameselection_title.get_width() / 2, 60))
+        renderer.blit(self.slider_text, (WIDTH / 2 - self.slider_text.get_width() / 2 - 25, 200))
+        renderer.blit(self.toggle_text, (WIDTH / 2 - self.toggle_text.get_width() / 2, 360))
+        renderer.blit(self.slider_value_text, value_pos)
         
     
     def switch(self, scene):
@@ -217,33 +341,59 @@ class GameSelection(Scene):
         if scene == 'play':
             self.game.gamescene.set_scene(TowerCats(self.game, rings=round(self.widgets['slider'].getValue()), shuffle=self.widgets['toggle'].getValue()))
         elif scene == 'back':
-            self.game.gamescene.set_scene(MainMenu(game))
+            self.game.gamescene.open(MainMenu)
+
+    def next_scenes(self):
+        return (MainMenu,)
+
+    def all_widgets(self):
+        return self.widgets.values()
     
     def destroy(self):
         for i, v in self.widgets.items():
             pygame_widgets.WidgetHandler().removeWidget(v)
 
 class Leaderboard(Scene):
-    def __init__(self, game):
+    pooled = True
+
+    def __init__(self, game, mode=None, focus=None):
         self.game = game
         self.screen = game.screen
-        self.font = pygame.font.Font(font_bold, 20)
-        self.title_font = pygame.font.Font(font_bold, 36)  # Larger font for the title
-        self.title = self.title_font.render("Leaderboard", True, font_color)
-
-        self.leaderboard_entries = self.load_leaderboard()
-        self.content_height = 50 * (len(self.leaderboard_entries) + 1)  # Include space for the header
-        self.surface = pygame.Surface((WIDTH, self.content_height + 20), pygame.SRCALPHA)
-        self.surface.fill((255, 255, 255, 128))  # Fill with semi-transparent white
-
-        self.y_scroll = 0
+        self.font = assets.font(font_bold, 20)
+        self.title_font = assets.font(font_bold, 36)  # Larger font for the title
+        self.title = assets.text(self.title_font, "Leaderboard", font_color)
+
+        # one board per (rings, shuffle) mode
+        self.boards = self.load_leaderboard()
+        self.modes = self.boards.modes() or [(None, None)]
+        self.mode = mode if mode in self.modes else self.modes[0]
+        self.focus = focus # entry to center the view on, e.g. a score that was just saved
+
+        # virtual list, only the rows in view are fetched from the tree and rasterized
+        self.view = pygame.Rect(0, 160, WIDTH, HEIGHT - 160)
+        self.header_height = 50
+        self.row_height = 49 # Adjust this value to change spacing between entries
+        self.body = pygame.Rect(0, self.view.y + self.header_height, WIDTH, self.view.height - self.header_height)
+        self.panel = pygame.Surface(self.view.size, pygame.SRCALPHA)
+        self.panel.fill((255, 255, 255, 128))  # Fill with semi-transparent white
+        self.rows = OrderedDict() # rank -> rendered row, least recently used first
+        self.row_cache_size = 48
+
+        self.y_scroll = 0 # pixels, eases toward scroll_target
+        self.scroll_target = 0
         self.create_leaderboard()
 
+        self.router = EventRouter()
+        self.router.on(pygame.MOUSEWHEEL, self.handle_wheel)
+        self.router.on(pygame.KEYDOWN, self.handle_key)
+
         self.widgets = {
-            'back': Button(self.screen, 0,0,125,45,borderThickness=3, font=pygame.font.Font(font_bold, 27), radius = 50, inactiveColour=inactive, hoverColour=hover,pressedColour=click, inactiveBorderColour=border_inactive,hoverBorderColour=border_hover,pressedBorderColour=border_click, text="Back", onRelease=lambda: game.gamescene.set_scene(MainMenu(game)))
+            'back': Button(self.screen, 0,0,125,45,borderThickness=3, font=assets.font(font_bold, 27), radius = 50, inactiveColour=inactive, hoverColour=hover,pressedColour=click, inactiveBorderColour=border_inactive,hoverBorderColour=border_hover,pressedBorderColour=border_click, text="Back", onRelease=lambda: game.gamescene.open(MainMenu)),
+            'prev': Button(self.screen, 60, 122, 40, 32,borderThickness=3, font=assets.font(font_bold, 20), radius = 16, inactiveColour=inactive, hoverColour=hover,pressedColour=click, inactiveBorderColour=border_inactive,hoverBorderColour=border_hover,pressedBorderColour=border_click, text="<", onRelease=lambda: self.switch_mode(-1)),
+            'next': Button(self.screen, WIDTH - 100, 122, 40, 32,borderThickness=3, font=assets.font(font_bold, 20), radius = 16, inactiveColour=inactive, hoverColour=hover,pressedColour=click, inactiveBorderColour=border_inactive,hoverBorderColour=border_hover,pressedBorderColour=border_click, text=">", onRelease=lambda: self.switch_mode(1))
         }
 
-        self.bg_image = pygame.image.load("images/game/backgrounds/leaderboard_bg.png")
+        self.bg_image = assets.background("images/game/backgrounds/leaderboard_bg.png")
         self.bg_rect = self.bg_image.get_rect(topleft=(0, 0))
 
     '''def load_leaderboard(self):
@@ -255,43 +405,161 @@ class Leaderboard(Scene):
                 return data[:10]
         return []'''
     
-    def load_leaderboard(self):
-        tree = BinaryTree().load_json()
-        return tree
-
-    def create_leaderboard(self):
-        # Define columns and their positions
-        columns = ["Rank", "Name", "Score"]
-        column_positions = [10, 150, 400]  # Adjust these positions as needed for proper spacing
+    def load_leaderboard(self): # shared with the game, saves update it in place
+        return self.game.leaderboards
+
+    @classmethod
+    def prefetch(cls, game): # the mode it opens on is the slow part, O(n) from the store
+        modes = game.leaderboards.modes()
+        if modes:
+            game.leaderboards.get(*modes[0])
+
+    def resume(self, mode=None, focus=None):
+        super().resume()
+        self.modes = self.boards.modes() or [(None, None)] # a save can add a mode
+        self.mode = mode if mode in self.modes else self.modes[0]
+        self.focus = focus
+        self.create_leaderboard()
 
-        # Render header
-        for col, pos in zip(columns, column_positions):
-            header = self.font.render(col, True, header_color)
-            self.surface.blit(header, (pos, 10))  # Adjust the y position of the header
+    def switch_mode(self, step):
+        self.game.sfx['button'].play()
+        self.mode = self.modes[(self.modes.index(self.mode) + step) % len(self.modes)]
+        self.focus = None
+        self.create_leaderboard()
+        self.game.renderer.invalidate()
+
+    def focus_rank(self): # rank of the focused entry, scanning past any ties
+        tree = self.leaderboard_entries
+        if not self.focus or not len(tree):
+            return None
+        rank = tree.rank(self.focus['score'])
+        for i, entry in enumerate(tree.values_from(rank), rank):
+            if entry['score'] != self.focus['score']:
+                break
+            if entry['name'] == self.focus['name']:
+                return i
+        return None
 
-        # Render leaderboard entries
-        entry_y_spacing = 49  # Adjust this value to change spacing between entries
-        for i, entry in enumerate(self.leaderboard_entries.get_first_values(10)):
-            rank_text = self.font.render(f"{i + 1}", True, font_color)
-            name_text = self.font.render(entry['name'], True, font_color)
-            score_text = self.font.render(str(entry['score']), True, font_color)
+    def create_leaderboard(self):
+        self.leaderboard_entries = self.boards.get(*self.mode)
+        self.mode_text = assets.text(self.font, mode_name(self.mode), font_color)
+        self.rows.clear()
 
-            texts = [rank_text, name_text, score_text]
-            for text, pos in zip(texts, column_positions):
-                self.surface.blit(text, (pos, 60 + i * entry_y_spacing))  # Adjust the y position for entries
+        # Define columns and their positions
+        self.column_positions = [10, 150, 400]  # Adjust these positions as needed for proper spacing
+        self.header = pygame.Surface((WIDTH, self.header_height), pygame.SRCALPHA)
+        for col, pos in zip(["Rank", "Name", "Score"], self.column_positions):
+            header = assets.text(self.font, col, header_color)
+            self.header.blit(header, (pos, 10))  # Adjust the y position of the header
+
+        # start at the top, or with the focused entry in the middle
+        self.focus_at = self.focus_rank()
+        self.y_scroll = self.scroll_target = 0
+        if self.focus_at is not None:
+            self.scroll_to((self.focus_at - 1) * self.row_height - self.body.height // 2 + self.row_height // 2)
+            self.y_scroll = self.scroll_target
+
+    def max_scroll(self):
+        return max(0, len(self.leaderboard_entries) * self.row_height - self.body.height)
+
+    def scroll_to(self, y):
+        self.scroll_target = min(max(0, y), self.max_scroll())
+
+    def handle_wheel(self, event):
+        self.scroll_to(self.scroll_target - event.y * self.row_height * 2)
+
+    def handle_key(self, event):
+        page = self.body.height - self.row_height
+        if event.key == pygame.K_PAGEDOWN:
+            self.scroll_to(self.scroll_target + page)
+        elif event.key == pygame.K_PAGEUP:
+            self.scroll_to(self.scroll_target - page)
+        elif event.key == pygame.K_HOME:
+            self.scroll_to(0)
+        elif event.key == pygame.K_END:
+            self.scroll_to(self.max_scroll())
+
+    def row(self, rank, entry): # rendered row, cached by rank
+        surface = self.rows.get(rank)
+        if surface is not None:
+            self.rows.move_to_end(rank)
+            return surface
+        surface = pygame.Surface((WIDTH, self.row_height), pygame.SRCALPHA)
+        if rank == self.focus_at:
+            surface.fill((255, 220, 220, 200), (0, 0, WIDTH, self.row_height - 4))
+        texts = [assets.text(self.font, f"{rank}", font_color),
+                 assets.text(self.font, entry['name'], font_color),
+                 assets.text(self.font, str(entry['score']), font_color)]
+        for text, pos in zip(texts, self.column_positions):
+            surface.blit(text, (pos, 5))
+        self.rows[rank] = surface
+        if len(self.rows) > self.row_cache_size:
+            self.rows.popitem(last=False)
+        return surface
+
+    def visible_rows(self): # [(y, surface)] for the rows in view, O(log n + rows on screen)
+        first = int(self.y_scroll // self.row_height)
+        count = self.body.height // self.row_height + 2
+        result = []
+        for i, entry in enumerate(self.leaderboard_entries.values_from(first + 1)):
+            if i == count:
+                break
+            rank = first + 1 + i
+            result.append((self.body.y + (rank - 1) * self.row_height - round(self.y_scroll), self.row(rank, entry)))
+        return result
+
+    def scrollbar(self):
+        total = len(self.leaderboard_entries) * self.row_height
+        if total <= self.body.height:
+            return None
+        height = max(20, self.body.height * self.body.height // total)
+        y = self.body.y + (self.body.height - height) * self.y_scroll / self.max_scroll()
+        return pygame.Rect(WIDTH - 8, round(y), 5, height)
 
     def run(self, events):
-        self.screen.blit(self.bg_image, self.bg_rect.topleft)
-        self.screen.blit(self.title, (WIDTH / 2 - self.title.get_width() / 2, 80))
-
-        self.screen.blit(self.surface, (0, 160))
-    
+        renderer = self.game.renderer
+        self.router.dispatch(events)
+        if self.y_scroll != self.scroll_target: # smooth scrolling
+            self.y_scroll += (self.scroll_target - self.y_scroll) * 0.35
+            if abs(self.scroll_target - self.y_scroll) < 0.5:
+                self.y_scroll = self.scroll_target
+            renderer.dirty(self.body)
+
+        renderer.widgets(self.widgets.values())
+        renderer.restore(self.bg_image, self.bg_rect.topleft)
+        renderer.blit(self.title, (WIDTH / 2 - self.title.get_width() / 2, 80))
+        renderer.blit(self.mode_text, (WIDTH / 2 - self.mode_text.get_width() / 2, 128))
+
+        if renderer.touches(self.view):
+            renderer.blit(self.panel, self.view.topleft)
+            renderer.blit(self.header, self.view.topleft)
+            rows = self.visible_rows()
+            bar = self.scrollbar()
+            for _ in renderer.clips(self.body):
+                for y, surface in rows:
+                    self.screen.blit(surface, (0, y))
+                if bar:
+                    pygame.draw.rect(self.screen, header_color, bar, border_radius=2)
+
+    def next_scenes(self):
+        return (MainMenu,)
+
+    def all_widgets(self):
+        return self.widgets.values()
 
     def destroy(self):
-        pass
+        for i, v in self.widgets.items():
+            pygame_widgets.WidgetHandler().removeWidget(v)
+
+def mode_name(mode):
+    rings, shuffle = mode
+    if rings is None:
+        return "Classic"
+    return f"{rings} Cats" + (" Shuffled" if shuffle else "")
 
 class TowerCats(Scene):
-    def __init__(self, game, rings, shuffle=False):
+    def __init__(self, game, rings, shuffle=False, autoplay_speed=4, difficulty=DEFAULT_DIFFICULTY):
+        from hanoi import Hanoi, Tower
         self.game = game
         self.screen = game.screen
         self.paused = False
@@ -313,7 +581,9 @@ class TowerCats(Scene):
         righterTower.image_rect.x, righterTower.image_rect.y = right - righterTower.image_rect.width // 2, HEIGHT - righterTower.image_rect.height
 
         self.widget = {
-            "pause": Button(self.screen, 0, 0, 50, 50,font=pygame.font.Font(font_bold, 46),borderThickness=5, inactiveColour=inactive, hoverColour=hover,pressedColour=click, inactiveBorderColour=border_inactive,hoverBorderColour=border_hover,pressedBorderColour=border_click, image=scale(pygame.image.load('images/game/pause.png'), (50,50)), onRelease=self.pause)
+            "pause": Button(self.screen, 0, 0, 50, 50,font=assets.font(font_bold, 46),borderThickness=5, inactiveColour=inactive, hoverColour=hover,pressedColour=click, inactiveBorderColour=border_inactive,hoverBorderColour=border_hover,pressedBorderColour=border_click, image=assets.scaled('images/game/pause.png', (50,50)), onRelease=self.pause),
+            "hint": Button(self.screen, WIDTH - 110, 0, 110, 50,font=assets.font(font_bold, 24),borderThickness=5, inactiveColour=inactive, hoverColour=hover,pressedColour=click, inactiveBorderColour=border_inactive,hoverBorderColour=border_hover,pressedBorderColour=border_click, radius=25, text="Hint", onRelease=self.hint),
+            "auto": Button(self.screen, WIDTH - 110, 55, 110, 50,font=assets.font(font_bold, 24),borderThickness=5, inactiveColour=inactive, hoverColour=hover,pressedColour=click, inactiveBorderColour=border_inactive,hoverBorderColour=border_hover,pressedBorderColour=border_click, radius=25, text="Auto", onRelease=self.autoplay)
         }
 
         towers = Stack()
@@ -324,69 +594,97 @@ class TowerCats(Scene):
         for i in towers:
             i.hitbox_rect.x, i.hitbox_rect.y = i.image_rect.x - (i.hitbox_rect.width // 2 - i.image_rect.width // 2), i.image_rect.y
 
-        self.hanoi = Hanoi(self.game, towers, rings, shuffled=shuffle)
+        self.shuffle = bool(shuffle)
+        self.hanoi = Hanoi(self.game, towers, rings, shuffled=shuffle, difficulty=difficulty)
+        self.hanoi.autoplay_delay = 1 / autoplay_speed # moves per second
+        self.game.leaderboards.prefetch(rings, self.shuffle) # Winner ranks the score against it
+
+        self.router = EventRouter()
+        self.router.on(pygame.KEYDOWN, self.handle_key)
+        self.router.on(pygame.MOUSEBUTTONUP, self.hanoi.click)
 
         self.timer_rect = pygame.Rect(WIDTH // 2 - 200 // 2, 25, 200, 60)
         self.moves_rect = pygame.Rect(WIDTH // 2 - 200 // 2, 75, 200, 70)
+        self.timer_pos = (self.timer_rect.x + 10, self.timer_rect.y + 10)
+        self.moves_pos = (self.moves_rect.x + 10, self.moves_rect.y + 10)
         self.text_color = (0,0,0)  
-
-        self.bg_image = pygame.image.load("images/game/backgrounds/game_bg.png")
+        self.font = assets.font(None, 54)
+        # the texts are only formatted again when the number changes, an idle frame allocates nothing
+        self.time_from = self.time_until = 0 # the second on screen, compared as is so no int gets made
+        self.shown_moves = None
+        self.timer_text = self.moves_text = None
+        self.buttons = [] # pause menu
+        self.active = list(self.widget.values()) # what the renderer checks for hover, with the pause menu when paused
+
+        self.bg_image = assets.background("images/game/backgrounds/game_bg.png")
         self.bg_rect = self.bg_image.get_rect(topleft=(0, 0))
 
     def run(self, events):
-        self.screen.blit(self.bg_image, self.bg_rect.topleft)
+        renderer = self.game.renderer
+        # ESC pauses, clicks go to the towers
+        self.router.dispatch(events)
         
-        font = pygame.font.Font(None, 54)
-        timer_text = font.render(f"Time: {int(self.hanoi.time)}", True, self.text_color)
-        moves_text = font.render(f"Moves: {self.hanoi.moves}", True, self.text_color)
-        
-        self.screen.blit(timer_text, (self.timer_rect.x + 10, self.timer_rect.y + 10))
-        self.screen.blit(moves_text, (self.moves_rect.x + 10, self.moves_rect.y + 10))
+        if not self.paused:
+            self.hanoi.update()
+
+        if not self.time_from <= self.hanoi.time < self.time_until:
+            seconds = int(self.hanoi.time)
+            self.time_from, self.time_until = seconds, seconds + 1
+            self.timer_text = assets.text(self.font, f"Time: {seconds}", self.text_color)
+        if self.hanoi.moves != self.shown_moves:
+            self.shown_moves = self.hanoi.moves
+            self.moves_text = assets.text(self.font, f"Moves: {self.shown_moves}", self.text_color)
+        renderer.label('time', self.timer_text, self.timer_pos)
+        renderer.label('moves', self.moves_text, self.moves_pos)
+        renderer.widgets(self.active)
+
+        renderer.restore(self.bg_image, self.bg_rect.topleft)
         
-        # Check for ESC key press to pause
-        for event in events:
-            self.handle_event(event)
+        renderer.blit(self.timer_text, self.timer_pos)
+        renderer.blit(self.moves_text, self.moves_pos)
         
         if not self.paused:
-            self.hanoi.update(events)
+            self.hanoi.draw()
             self.check_winner()  
 
     def check_winner(self):
-        righterTower = self.hanoi.towers.get_by_index(2) 
-        if len(righterTower.stack) == self.hanoi.rings:
+        if self.hanoi.state.is_solved():
             score = self.calculate_score()
-            self.game.gamescene.set_scene(Winner(self.game, score))
+            replay = self.hanoi.replay.finish(self.hanoi.time, self.hanoi.assisted) # saved with the score
+            self.game.gamescene.set_scene(Winner(self.game, score, self.hanoi.rings, self.shuffle, replay))
 
     def calculate_score(self):
-        moves = self.hanoi.moves
-        timer = self.hanoi.time
-        rings = self.hanoi.rings
-        base = 1000
-        super_base = rings * base
-        score = super_base - (((timer*moves) + (moves/2))**0.5)
-
-        '''print("Moves: ", moves)
-        print("Timer: ", timer)
-        print("Min Move: ", min_move)
-        print("Rings: ", rings)
-        print("Base: ", base)
-        print("Score: ", score)'''
-
-        return max(0, int(score)) 
-
-    def handle_event(self, event):
-        if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+        # the formula lives in scoring.py so replay.py can recompute it, the time is rounded
+        # to the millisecond like the replay keeps it
+        hanoi = self.hanoi
+        return scoring.classic(hanoi.rings, hanoi.moves, hanoi.min_moves, scoring.quantize(hanoi.time), hanoi.assisted)
+
+    def handle_key(self, event):
+        if event.key == pygame.K_ESCAPE:
             self.pause()
 
+    def hint(self):
+        self.game.sfx['button'].play()
+        if not self.paused:
+            self.hanoi.show_hint()
+
+    def autoplay(self):
+        self.game.sfx['button'].play()
+        if not self.paused:
+            self.hanoi.set_autoplay(not self.hanoi.autoplay)
+            self.widget['auto'].setText("Stop" if self.hanoi.autoplay else "Auto")
+
     def pause(self):
         self.game.sfx['button'].play()
         if not self.paused:
             self.hanoi.pause = True
             self.paused = True
             self.buttons = [
-                Button(self.screen, WIDTH / 2 - 300 / 2, 200 + 20, 300, 100,font=pygame.font.Font(font_bold, 42),borderThickness=5, inactiveColour=inactive, hoverColour=hover,pressedColour=click, inactiveBorderColour=border_inactive,hoverBorderColour=border_hover,pressedBorderColour=border_click, radius=50, text="Resume", fontSize=64, onRelease=self.resume),
-                Button(self.screen, WIDTH / 2 - 300 / 2, 300 + 30, 300, 100,font=pygame.font.Font(font_bold, 52),borderThickness=5, inactiveColour=inactive, hoverColour=hover,pressedColour=click, inactiveBorderColour=border_inactive,hoverBorderColour=border_hover,pressedBorderColour=border_click, radius=50, text="Quit", fontSize=64, onRelease=self.quit)
+                Button(self.screen, WIDTH / 2 - 300 / 2, 200 + 20, 300, 100,font=assets.font(font_bold, 42),borderThickness=5, inactiveColour=inactive, hoverColour=hover,pressedColour=click, inactiveBorderColour=border_inactive,hoverBorderColour=border_hover,pressedBorderColour=border_click, radius=50, text="Resume", fontSize=64, onRelease=self.resume),
+                Button(self.screen, WIDTH / 2 - 300 / 2, 300 + 30, 300, 100,font=assets.font(font_bold, 52),borderThickness=5, inactiveColour=inactive, hoverColour=hover,pressedColour=click, inactiveBorderColour=border_inactive,hoverBorderColour=border_hover,pressedBorderColour=border_click, radius=50, text="Quit", fontSize=64, onRelease=self.quit)
             ]
+            self.active = list(self.widget.values()) + self.buttons
+            self.game.renderer.invalidate() # board is hidden while paused
     
     def resume(self):
         self.game.sfx['button'].play()
@@ -394,12 +692,15 @@ class TowerCats(Scene):
         self.paused = False
         for i in self.buttons:
             pygame_widgets.WidgetHandler().removeWidget(i)
+        self.buttons = []
+        self.active = list(self.widget.values())
+        self.game.renderer.invalidate()
 
     def quit(self):
         self.game.sfx['button'].play()
         for i in self.buttons:
             pygame_widgets.WidgetHandler().removeWidget(i)
-        self.game.gamescene.set_scene(MainMenu(self.game))
+        self.game.gamescene.open(MainMenu)
 
 
     def destroy(self):
@@ -407,22 +708,39 @@ class TowerCats(Scene):
             pygame_widgets.WidgetHandler().removeWidget(v)
 
 class Winner(Scene):
-    def __init__(self, game, score):
+    def __init__(self, game, score, rings=None, shuffle=None, replay=None):
+        from pygame_widgets.textbox import TextBox
         self.game = game
+        self.replay = replay # encoded replay.Replay, None for scores from elsewhere
         self.screen = game.screen
-        self.font = pygame.font.Font(font_bold, 64)
-        self.title = self.font.render("WINNER", True, (0, 0, 0))
+        self.font = assets.font(font_bold, 64)
+        self.title = assets.text(self.font, "WINNER", (0, 0, 0))
         self.score = score
-
-        self.name_box = TextBox(self.screen, WIDTH / 2 - 150, 300, 300, 60, fontSize=40, borderThickness=3, radius=10, borderColour=border_inactive, font=pygame.font.Font('font/arcade.TTF', 32), onSubmit=self.save_name)
+        self.mode = (rings, shuffle)
+
+        # where this score lands on its mode's board, the game loaded it while it was played
+        board = self.game.leaderboards.get(rings, shuffle)
+        self.rank = board.rank(score)
+        total = len(board) + 1
+        small = assets.font(font_bold, 22)
+        self.rank_text = assets.text(small, f"Rank {self.rank} of {total}   Beats {round(board.percentile(score))}%", font_color)
+        # the entries just above and below, the one below moves down a rank for this score
+        window = [(rank if rank < self.rank else rank + 1, entry['name'], entry['score'])
+                  for rank, entry in board.around(self.rank, before=1, after=0)]
+        window.append((self.rank, "YOU", score))
+        window.sort(key=lambda row: row[0])
+        row_font = assets.font(font_bold, 18)
+        self.window = [(assets.text(row_font, str(rank), font_color), assets.text(row_font, name, header_color if name == "YOU" else font_color), assets.text(row_font, str(value), font_color)) for rank, name, value in window]
+
+        self.name_box = TextBox(self.screen, WIDTH / 2 - 150, 300, 300, 60, fontSize=40, borderThickness=3, radius=10, borderColour=border_inactive, font=assets.font(font_san, 32), onSubmit=self.save_name)
         
         # Initialize buttons
         self.buttons = [
-            Button(self.game.screen, WIDTH / 2 - 150, 400, 300, 100,font=pygame.font.Font(font_bold, 46),borderThickness=5, inactiveColour=inactive, hoverColour=hover,pressedColour=click, inactiveBorderColour=border_inactive,hoverBorderColour=border_hover,pressedBorderColour=border_click, radius=50, text='Save', fontSize=64, onRelease=lambda: self.click('save')),
-            Button(self.game.screen, WIDTH / 2 - 150, 520, 300, 100,font=pygame.font.Font(font_bold, 36),borderThickness=5, inactiveColour=inactive, hoverColour=hover,pressedColour=click, inactiveBorderColour=border_inactive,hoverBorderColour=border_hover,pressedBorderColour=border_click, radius=50, text='Main Menu', fontSize=64, onRelease=lambda: self.click('main'))
+            Button(self.game.screen, WIDTH / 2 - 150, 400, 300, 100,font=assets.font(font_bold, 46),borderThickness=5, inactiveColour=inactive, hoverColour=hover,pressedColour=click, inactiveBorderColour=border_inactive,hoverBorderColour=border_hover,pressedBorderColour=border_click, radius=50, text='Save', fontSize=64, onRelease=lambda: self.click('save')),
+            Button(self.game.screen, WIDTH / 2 - 150, 520, 300, 100,font=assets.font(font_bold, 36),borderThickness=5, inactiveColour=inactive, hoverColour=hover,pressedColour=click, inactiveBorderColour=border_inactive,hoverBorderColour=border_hover,pressedBorderColour=border_click, radius=50, text='Main Menu', fontSize=64, onRelease=lambda: self.click('main'))
         ]
 
-        self.bg_image = pygame.image.load("images/game/backgrounds/winner_bg.png")
+        self.bg_image = assets.background("images/game/backgrounds/winner_bg.png")
         self.bg_rect = self.bg_image.get_rect(topleft=(0, 0))
 
     def click(self, command):
@@ -430,15 +748,21 @@ class Winner(Scene):
         if command == 'save':
             self.save_name()
         elif command == 'main':
-            self.game.gamescene.set_scene(MainMenu(self.game))
+            self.game.gamescene.open(MainMenu)
 
     def run(self, events):
-        self.screen.blit(self.bg_image, self.bg_rect.topleft)
-        self.screen.blit(self.title, (WIDTH / 2 - self.title.get_width() / 2, 75))
+        renderer = self.game.renderer
+        renderer.widgets([self.name_box] + self.buttons)
+        renderer.restore(self.bg_image, self.bg_rect.topleft)
+        renderer.blit(self.title, (WIDTH / 2 - self.title.get_width() / 2, 75))
 
         # Display the score
-        score_text = self.font.render(f"Score: {self.score}", True, (0, 0, 0))
-        self.screen.blit(score_text, (WIDTH / 2 - score_text.get_width() / 2, 200))
+        score_text = assets.text(self.font, f"Score: {self.score}", (0, 0, 0))
+        renderer.blit(score_text, (WIDTH / 2 - score_text.get_width() / 2, 200))
+        renderer.blit(self.rank_text, (WIDTH / 2 - self.rank_text.get_width() / 2, 270))
+        for i, row in enumerate(self.window):
+            for text, x in zip(row, (150, 230, 380)):
+                renderer.blit(text, (x, 626 + i * 24))
         
         # Update and draw TextBox
         self.name_box.draw()
@@ -450,82 +774,183 @@ class Winner(Scene):
     def save_name(self):
         name = self.name_box.getText()
         if name:
-            # Load existing names
-            if os.path.exists('leaderboard.json'):
-                with open('leaderboard.json', 'r') as file:
-                    data = json.load(file)
-            else:
-                data = []
-
-            found = False
-            for i in data:
-                if name == i['name']:
-                    found = True
-                    if self.score > i['score']:
-                        i['score'] = self.score
-                    break
-            # Append the new name with score if not found
-            if not found:
-                data.append({"name": name, "score": self.score})
-
-                # Save the updated list back to the file
-            with open('leaderboard.json', 'w') as file:
-                json.dump(data, file, indent=4)
+            # upsert, only replaces this name's score in this mode if it is higher
+            rings, shuffle = self.mode
+            entry = self.game.leaderboards.save(name, self.score, rings, shuffle, self.replay)
 
             self.name_box.setText('')
+            # show where it landed
+            self.game.gamescene.open(Leaderboard, mode=self.mode, focus=entry)
+            return
         
-        self.game.gamescene.set_scene(MainMenu(self.game))
+        self.game.gamescene.open(MainMenu)
 
     def destroy(self):
         pygame_widgets.WidgetHandler().removeWidget(self.name_box)
         for button in self.buttons:
             pygame_widgets.WidgetHandler().removeWidget(button)
 
+# decoded on the loader threads at startup, the menu only needs its own background
+PRELOAD_BACKGROUNDS = ['images/game/backgrounds/gselect_bg.png', 'images/game/backgrounds/leaderboard_bg.png',
+                       'images/game/backgrounds/game_bg.png', 'images/game/backgrounds/winner_bg.png']
+PRELOAD_IMAGES = ['images/game/tower.png']
+PRELOAD_CATS = [f'images/game/cats/cat{i}.png' for i in range(1, 10)] # only kept at the size Ring draws them
+
 class Game:
-    def __init__(self):
-        self.screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    def __init__(self, fps=30, fps_mode='capped', fixed_step=False, scores=None): # scores: a store.ScoreStore to use instead of leaderboard.db
+        report = startup.report
+        self.clock = FrameClock(fps, fps_mode, fixed_step)
+        with report.stage('display'):
+            self.screen = self.open_display(fps_mode == 'vsync')
         
         self.delta = 0
         self.run = False
 
-        self.bgm = pygame.mixer.Sound('sounds/music/bgm.mp3')
-        self.sfx = {}
-        sfx_path = 'sounds/sfx'
-        for file in os.listdir(sfx_path):
-            name = file.removesuffix('.mp3')
-            print(file)
-            self.sfx[name] = pygame.mixer.Sound('sounds/sfx/'+file)
-
-
-        if not os.path.exists('settings.json'):
-            with open('settings.json', 'w+') as file:
-                file.write('{"bgm": 100, "sfx": 100}')
-
-        with open('settings.json', 'r+') as file:
-            volume = json.load(file)
-        self.volume = volume
-        for i in self.sfx.values():
-            i.set_volume(self.volume['sfx']/100)
-        self.bgm.set_volume(self.volume['bgm'] / 100)
-        self.bgm.play(-1)
-        self.gamescene = SceneManager(MainMenu(self))
+        # every disk write goes through here (writer.py)
+        self.writer = BackgroundWriter()
+        # everything the main menu doesnt need loads here while it is already up
+        self.loader = ThreadPoolExecutor(max_workers=2, thread_name_prefix='loader')
+
+        with report.stage('settings'):
+            if not os.path.exists('settings.json'):
+                atomic_write_json('settings.json', {"bgm": 100, "sfx": 100})
+
+            with open('settings.json', 'r') as file:
+                volume = json.load(file)
+            self.volume = volume
+
+        with report.stage('audio'):
+            # streamed, not decoded into memory
+            self.bgm = Music('sounds/music/bgm.mp3', self.volume['bgm'] / 100)
+            self.loader.submit(self.bgm.play)
+            # decoded on first use, the rest finishes in the background
+            self.sfx = SoundEffects('sounds/sfx', self.volume['sfx'] / 100)
+            self.sfx.preload(self.loader)
+        with report.stage('scores'):
+            if scores is None:
+                scores = ScoreStore(writer=self.writer) # imports leaderboard.json the first time
+            self.scores = scores
+            self.leaderboards = Leaderboards(self.scores) # modes load when first shown, saves apply in place
+        self.renderer = Renderer(self.screen)
+        self.profiler = Profiler(self.renderer) # F3 overlay, F4 trace dump
+        with report.stage('main menu'):
+            self.gamescene = SceneManager(None, self.renderer, self)
+            self.gamescene.open(MainMenu) # the rest of the menus get built in the background
+        assets.preload(self.loader, PRELOAD_BACKGROUNDS, alpha=False)
+        assets.preload(self.loader, PRELOAD_IMAGES)
+        assets.preload(self.loader, PRELOAD_CATS, size=(130, 60))
+        # whats alive now lives for the whole game, full collections skip it from here on
+        gc.freeze()
+
+    def open_display(self, vsync):
+        # pygame only syncs SCALED or OPENGL windows, SCALED at the window's own size looks the same
+        # on a software renderer there is no vsync, the clock goes back to capping so it doesnt spin
+        if vsync:
+            try:
+                with warnings.catch_warnings(record=True) as caught:
+                    warnings.simplefilter('always')
+                    screen = pygame.display.set_mode((WIDTH, HEIGHT), pygame.SCALED, vsync=1)
+                if not any('renderer' in str(warning.message) for warning in caught):
+                    return screen
+            except pygame.error:
+                screen = pygame.display.set_mode((WIDTH, HEIGHT))
+            print("vsync isnt available, capping at", self.clock.fps, "fps instead")
+            self.clock.mode = 'capped'
+            return screen
+        return pygame.display.set_mode((WIDTH, HEIGHT))
+
     def quit(self):
         self.run = False
 
-    def mainloop(self):
+    def shutdown(self): # waits for queued writes so nothing is lost on exit
+        self.loader.shutdown(cancel_futures=True)
+        self.writer.close()
+        self.scores.close()
+
+    def handle_key(self, event): # keys that work in every scene
+        if event.key == TOGGLE_KEY:
+            self.profiler.toggle()
+        elif event.key == DUMP_KEY and self.profiler.frames:
+            print("Trace written to", self.profiler.dump(writer=self.writer))
+
+    def mainloop(self, budget=None): # budget is a memory.FrameBudget for --alloc-budget
         self.run = True
+        prof = self.profiler
+        first = True
         while self.run:
-            self.screen.fill((255, 255, 255))
+            if budget:
+                budget.begin()
+            prof.begin()
             events = pygame.event.get()
             for event in events:
                 if event.type == pygame.QUIT:
-                    self.run = False
-
-            self.gamescene.update(events)
-            self.delta = pygame.time.Clock().tick(30) / 1000
-            pygame_widgets.update(events)
-            pygame.display.update()
+                    self.quit()
+                elif event.type == pygame.KEYDOWN:
+                    self.handle_key(event)
+            prof.lap('events')
+
+            # the preload thread only builds scenes while the clock sleeps
+            # acquire/release instead of with, a with block allocates the bound __exit__ every frame
+            lock = self.gamescene.lock
+            lock.acquire()
+            try:
+                prof.lap('wait')
+                if self.renderer.full:
+                    self.screen.fill((255, 255, 255))
+                prof.lap('fill')
+                self.gamescene.update(events)
+                prof.lap_scene(self.gamescene.get_scene())
+            finally:
+                lock.release()
+            self.delta = self.clock.tick(self.renderer.idle) # nothing to flip, vsync wouldnt wait
+            prof.lap('clock')
+            lock.acquire()
+            try:
+                prof.lap('wait')
+                # widgets only change on input or under a dirty rect (hover, drag, text boxes),
+                # an idle frame skips them, pygame_widgets copies its widget set every update
+                if events or not self.renderer.idle:
+                    pygame_widgets.update(events)
+                prof.lap('widgets')
+                prof.draw(self.screen)
+                prof.lap('overlay')
+                self.renderer.present() # only pushes the dirty rects
+                prof.lap('present')
+            finally:
+                lock.release()
+            prof.end()
+            if first: # only once, perf_counter makes a float every call
+                startup.report.mark('first frame')
+                first = False
+            if budget:
+                budget.end(type(self.gamescene.get_scene()).__name__)
 
 if __name__ == '__main__':
-    game = Game()
-    game.mainloop()
+    parser = argparse.ArgumentParser(description="Tower of Cats")
+    parser.add_argument('--fps', type=int, default=30)
+    parser.add_argument('--fps-mode', choices=['capped', 'vsync', 'uncapped'], default='capped')
+    parser.add_argument('--fixed-step', action='store_true', help="advance the game timer in fixed 1/fps steps")
+    parser.add_argument('--frame-stats', action='store_true', help="print frame time stats on exit")
+    parser.add_argument('--startup-report', action='store_true', help="print where startup time went (imports, stages, assets) on exit")
+    parser.add_argument('--memory-report', action='store_true', help="print a tracemalloc snapshot of every scene on exit")
+    parser.add_argument('--alloc-budget', type=int, nargs='?', const=0, metavar='BYTES',
+                        help="trace every frame and warn when one allocates more than BYTES (default 0)")
+    args = parser.parse_args()
+    if args.memory_report:
+        memory.report.start()
+    budget = memory.FrameBudget(args.alloc_budget) if args.alloc_budget is not None else None
+
+    game = Game(args.fps, args.fps_mode, args.fixed_step)
+    try:
+        game.mainloop(budget)
+        memory.report.snapshot(type(game.gamescene.get_scene()).__name__)
+    finally: # queued settings and scores still reach the disk when the loop raises
+        game.shutdown()
+    if args.frame_stats:
+        print(json.dumps(game.clock.stats()))
+    if args.startup_report:
+        startup.report.print()
+    if args.memory_report:
+        memory.report.print()
+    if budget:
+        print(json.dumps(budget.summary()))
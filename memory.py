@@ -0,0 +1,114 @@
+import json
+import sys
+import time
+import tracemalloc
+
+import assets
+
+# memory report, main.py --memory-report traces python allocations from startup and
+# takes a snapshot every time a scene is left, so each entry is what the game held
+# while in that scene, the biggest files and what grew since the previous snapshot
+# pixels live in SDL and arent traced, the asset caches report theirs separately
+# --alloc-budget is the per frame version, see FrameBudget
+
+TOP = 8
+# what measuring a frame costs by itself, a tuple and an int from get_traced_memory,
+# more or less depending on whether they come off python's free lists
+MEASURE_SLACK = 64
+
+
+class MemoryReport:
+    def __init__(self):
+        self.enabled = False
+        self.scenes = []
+        self.last = None
+
+    def start(self, frames=1):
+        tracemalloc.start(frames)
+        self.enabled = True
+
+    def stop(self):
+        if self.enabled:
+            tracemalloc.stop()
+            self.enabled = False
+
+    def snapshot(self, label):
+        if not self.enabled:
+            return
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+        entry = {"scene": label, "current_kb": current // 1024, "peak_kb": peak // 1024,
+                 "surfaces_kb": assets.surface_bytes() // 1024,
+                 "top": [{"file": stat.traceback[0].filename, "kb": stat.size // 1024, "blocks": stat.count}
+                         for stat in snapshot.statistics('filename')[:TOP]]}
+        if self.last:
+            entry["grew"] = [{"file": stat.traceback[0].filename, "kb": stat.size_diff // 1024}
+                             for stat in snapshot.compare_to(self.last, 'filename')[:TOP] if stat.size_diff > 0]
+        self.scenes.append(entry)
+        self.last = snapshot
+        tracemalloc.reset_peak()
+
+    def summary(self):
+        return {"scenes": self.scenes}
+
+    def print(self):
+        print(json.dumps(self.summary(), indent=2))
+
+
+class FrameBudget:
+    # debug mode for allocation free frames, main.py --alloc-budget BYTES
+    # every frame is traced and one that allocates more python memory than the budget
+    # (its peak over what was live when it started) gets a warning, at most one per
+    # interval, and the frame after a warning is snapshotted to show which lines kept memory
+    def __init__(self, budget=0, interval=1.0):
+        self.budget = budget
+        self.interval = interval
+        self.frames = 0
+        self.over = 0
+        self.worst = 0
+        self.warned = 0
+        self.inspect = False
+        self.before = None
+        self.live = 0
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def begin(self):
+        if self.inspect:
+            self.before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        self.live = tracemalloc.get_traced_memory()[0]
+
+    def measure(self): # (bytes kept, peak bytes) since begin()
+        current, peak = tracemalloc.get_traced_memory()
+        return current - self.live, peak - self.live
+
+    def end(self, label):
+        kept, peak = self.measure()
+        if self.before is not None: # the snapshots allocate, this frame doesnt count
+            ignore = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+            after = tracemalloc.take_snapshot().filter_traces(ignore)
+            grew = [stat for stat in after.compare_to(self.before.filter_traces(ignore), 'lineno') if stat.size_diff > 0]
+            for stat in grew[:5]:
+                print(f"  {stat.traceback[0]}: +{stat.size_diff} bytes", file=sys.stderr)
+            self.before = None
+            self.inspect = False
+            return
+        self.frames += 1
+        allocated = max(0, peak - MEASURE_SLACK)
+        self.worst = max(self.worst, allocated)
+        if allocated <= self.budget:
+            return
+        self.over += 1
+        now = time.perf_counter()
+        if now - self.warned >= self.interval:
+            self.warned = now
+            self.inspect = True
+            print(f"alloc budget: {label} frame allocated {allocated} bytes and kept {kept}"
+                  f" ({self.over} of {self.frames} frames over {self.budget})", file=sys.stderr)
+
+    def summary(self):
+        return {"budget": self.budget, "frames": self.frames, "over": self.over, "worst": self.worst}
+
+
+report = MemoryReport()
@@ -0,0 +1,137 @@
+import json
+import os
+import time
+from collections import deque
+
+import pygame
+
+import assets
+
+# frame profiler, off unless TOWERCATS_PROFILE=1 or F3 is pressed in game
+# the main loop calls lap(name) after each phase, so a phase is the time since the
+# previous lap, F3 shows an overlay with an fps graph, F4 dumps the last frames as a
+# chrome trace (open it in chrome://tracing or ui.perfetto.dev)
+
+ENV = 'TOWERCATS_PROFILE'
+TOGGLE_KEY = pygame.K_F3
+DUMP_KEY = pygame.K_F4
+
+
+class Profiler:
+    def __init__(self, renderer, history=300, enabled=None):
+        self.renderer = renderer
+        self.frames = deque(maxlen=history) # (start, end, [(phase, start, end)])
+        self.enabled = os.environ.get(ENV, '') not in ('', '0') if enabled is None else enabled
+        self.start = None
+        self.last = None
+        self.laps = None
+        self.names = {} # scene class -> its lap name, so a frame doesnt build the string
+
+        self.rect = pygame.Rect(0, 0, 230, 150)
+        self.rect.bottomright = renderer.screen.get_rect().bottomright
+        self.panel = pygame.Surface(self.rect.size, pygame.SRCALPHA)
+        self.font = assets.font(None, 18)
+        self.lines = [] # rendered text, refreshed a few times a second so it stays readable
+        self.refreshed = 0
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        self.renderer.dirty(self.rect) # show or wipe the overlay
+        self.start = None
+
+    def begin(self):
+        if not self.enabled:
+            return
+        self.start = self.last = time.perf_counter()
+        self.laps = []
+        self.renderer.dirty(self.rect) # the scene repaints under the overlay every frame
+
+    def lap(self, name):
+        if self.start is None:
+            return
+        now = time.perf_counter()
+        self.laps.append((name, self.last, now))
+        self.last = now
+
+    def lap_scene(self, scene): # lap named after the scene that ran
+        if self.start is None:
+            return
+        cls = type(scene)
+        name = self.names.get(cls)
+        if name is None:
+            name = self.names[cls] = cls.__name__ + '.run'
+        self.lap(name)
+
+    def end(self):
+        if self.start is None:
+            return
+        self.frames.append((self.start, time.perf_counter(), self.laps))
+        self.start = None
+
+    def phases(self, frames=30): # phase -> mean ms over the last frames
+        recent = list(self.frames)[-frames:]
+        totals = {}
+        for start, end, laps in recent:
+            for name, a, b in laps:
+                totals[name] = totals.get(name, 0) + (b - a)
+        return {name: total / len(recent) * 1000 for name, total in totals.items()}
+
+    def draw(self, screen):
+        if not self.enabled or not self.frames:
+            return
+        now = time.perf_counter()
+        if now - self.refreshed > 0.25:
+            self.refreshed = now
+            recent = list(self.frames)[-60:]
+            span = recent[-1][1] - recent[0][0]
+            fps = len(recent) / span if span else 0
+            phases = self.phases()
+            busy = sum(ms for name, ms in phases.items() if name != 'clock') # everything but the sleep
+            phases = sorted(phases.items(), key=lambda item: -item[1])[:5]
+            self.lines = [self.font.render(f"{fps:5.1f} fps  busy {busy:5.2f} ms", True, (255, 255, 255))]
+            self.lines += [self.font.render(f"{ms:6.2f}  {name}", True, (255, 220, 220)) for name, ms in phases]
+
+        panel = self.panel
+        panel.fill((0, 0, 0, 170))
+        for i, line in enumerate(self.lines):
+            panel.blit(line, (6, 4 + i * 14))
+
+        # frame to frame time of the last frames, lines at 60 and 30 fps
+        graph = pygame.Rect(6, self.rect.height - 54, self.rect.width - 12, 50)
+        scale = graph.height / 50 # 50 ms at the top
+        for ms, colour in ((1000 / 60, (90, 200, 90)), (1000 / 30, (220, 200, 80))):
+            y = graph.bottom - ms * scale
+            pygame.draw.line(panel, colour, (graph.x, y), (graph.right, y))
+        frames = list(self.frames)[-graph.width:]
+        points = []
+        for i in range(1, len(frames)):
+            ms = (frames[i][0] - frames[i - 1][0]) * 1000
+            points.append((graph.right - len(frames) + i, graph.bottom - min(ms, 50) * scale))
+        if len(points) > 1:
+            pygame.draw.lines(panel, (255, 120, 120), False, points)
+        screen.blit(panel, self.rect)
+
+    def trace(self): # chrome trace event format, times in microseconds
+        events = []
+        if not self.frames:
+            return {"traceEvents": events}
+        origin = self.frames[0][0]
+
+        def us(t):
+            return round((t - origin) * 1e6, 1)
+        for i, (start, end, laps) in enumerate(self.frames):
+            events.append({"name": "frame", "cat": "frame", "ph": "X", "ts": us(start), "dur": round((end - start) * 1e6, 1),
+                           "pid": 1, "tid": 1, "args": {"frame": i}})
+            for name, a, b in laps:
+                events.append({"name": name, "cat": "phase", "ph": "X", "ts": us(a), "dur": round((b - a) * 1e6, 1), "pid": 1, "tid": 1})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def dump(self, path=None, writer=None): # through the background writer when there is one
+        if path is None:
+            path = time.strftime('trace-%Y%m%d-%H%M%S.json')
+        if writer:
+            writer.write_json(path, self.trace())
+        else:
+            with open(path, 'w') as file:
+                json.dump(self.trace(), file)
+        return path
@@ -0,0 +1,57 @@
+import random
+
+from engine import HanoiState
+
+# shuffled starts with a known optimal distance to the goal (everything on the last peg)
+# the distance is a sum of 2**(ring-1) over the rings that are off their target, and
+# every ring that is off has 2 pegs to choose from, so there are exactly 2**popcount(d)
+# positions at distance d and sampling one of them is O(rings)
+
+DEFAULT_DIFFICULTY = 2 / 3 # what a uniformly random board averages
+
+
+def max_distance(rings):
+    return (1 << rings) - 1
+
+
+def random_state(rings, distance, rng=random, goal=2):
+    if not 0 <= distance <= max_distance(rings):
+        raise ValueError(f"Distance {distance} out of range for {rings} rings")
+    pegs = [[], [], []]
+    target = goal
+    for ring in range(rings, 0, -1):
+        if distance >> (ring - 1) & 1: # ring is off its target, either other peg works
+            source = rng.choice([p for p in range(3) if p != target])
+            pegs[source].append(ring)
+            target = 3 - source - target
+        else:
+            pegs[target].append(ring)
+    return HanoiState.from_pegs(pegs, rings)
+
+
+def generate(rings, difficulty=DEFAULT_DIFFICULTY, spread=0.1, rng=random):
+    # difficulty is the fraction of the longest possible distance, the distance is drawn
+    # within +-spread of it so boards vary, and it is never an already solved board
+    top = max_distance(rings)
+    low = max(1, min(top, round((difficulty - spread) * top)))
+    high = max(1, min(top, round((difficulty + spread) * top)))
+    return random_state(rings, rng.randint(low, high), rng)
+
+
+def state_index(state): # base 3 number whose digit (ring - 1) is the peg of that ring
+    index = 0
+    for ring in range(state.rings, 0, -1):
+        index = index * 3 + state.peg_of(ring)
+    return index
+
+
+def from_index(rings, index): # inverse of state_index
+    pegs = [0, 0, 0]
+    for ring in range(1, rings + 1):
+        index, peg = divmod(index, 3)
+        pegs[peg] |= 1 << (ring - 1)
+    if index:
+        raise ValueError(f"Index out of range for {rings} rings")
+    state = HanoiState(rings)
+    state.pegs = pegs
+    return state
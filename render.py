@@ -0,0 +1,128 @@
+import pygame
+
+# dirty rectangle renderer
+# scenes mark what changed this frame, restore the background under it and
+# draw through blit(), then only those rects get pushed to the display
+# a full redraw happens after invalidate() (new scene, pause menu, ...)
+
+ALWAYS_DIRTY = ('TextBox',) # by class name, the widget modules only load once a scene needs them
+NO_REGIONS = () # what an idle frame has to redraw, shared so it doesnt allocate
+
+
+class Renderer:
+    def __init__(self, screen):
+        self.screen = screen
+        self.full = True
+        self._next_full = False
+        self.rects = []
+        self._merged = None
+        self._everything = [screen.get_rect()]
+        self._labels = {} # key -> (surface, rect, pos) last drawn
+        self._hovered = set() # widgets under the mouse last frame
+        self._spare = set() # swapped with _hovered every frame instead of a new set
+
+    def invalidate(self):
+        # this frame may already be half drawn by the old scene, so repaint the next one too
+        self.full = self._next_full = True
+        self._labels.clear()
+
+    def dirty(self, *rects):
+        for rect in rects:
+            if rect:
+                self.rects.append(pygame.Rect(rect))
+        self._merged = None
+
+    def regions(self): # merged dirty rects, no overlaps so nothing gets blitted twice
+        if self.full:
+            return self._everything
+        if not self.rects:
+            return NO_REGIONS
+        if self._merged is None:
+            merged = []
+            for rect in self.rects:
+                rect = rect.copy()
+                i = rect.collidelist(merged)
+                while i != -1:
+                    rect.union_ip(merged.pop(i))
+                    i = rect.collidelist(merged)
+                merged.append(rect)
+            self._merged = merged
+        return self._merged
+
+    @property
+    def idle(self): # nothing to draw or push this frame
+        return not self.full and not self.rects
+
+    def touches(self, rect):
+        return self.full or pygame.Rect(rect).collidelist(self.regions()) != -1
+
+    def label(self, key, surface, pos): # marks a text dirty when its surface changes
+        last = self._labels.get(key)
+        if last is not None and last[0] is surface and last[2] == pos:
+            return last[1]
+        rect = surface.get_rect(topleft=pos)
+        if last is not None:
+            self.dirty(last[1])
+        self.dirty(rect)
+        self._labels[key] = (surface, rect, pos)
+        return rect
+
+    def widgets(self, widgets):
+        # pygame_widgets redraws every widget every frame, only hovered or
+        # dragged ones (and text boxes, they take keys and blink) can change
+        x, y = pygame.mouse.get_pos()
+        pressed = any(pygame.mouse.get_pressed())
+        hovered = self._spare
+        hovered.clear()
+        for widget in widgets:
+            if not widget.isVisible():
+                continue
+            over = widget.contains(x, y)
+            if over:
+                hovered.add(widget)
+            if over or pressed or widget in self._hovered or type(widget).__name__ in ALWAYS_DIRTY:
+                self.dirty(widget_rect(widget))
+        self._spare, self._hovered = self._hovered, hovered
+
+    def restore(self, background, pos=(0, 0)):
+        if self.idle:
+            return
+        for rect in self.regions():
+            self.screen.blit(background, rect, rect.move(-pos[0], -pos[1]))
+
+    def clips(self, rect): # sets the screen clip to each dirty region that touches rect
+        rect = pygame.Rect(rect)
+        try:
+            for region in self.regions():
+                clip = rect.clip(region)
+                if clip:
+                    self.screen.set_clip(clip)
+                    yield clip
+        finally:
+            self.screen.set_clip(None)
+
+    def blit(self, surface, pos, area=None): # clipped to the dirty regions
+        if self.idle:
+            return
+        dest = surface.get_rect(topleft=pos) if area is None else pygame.Rect(pos, area.size)
+        offset = (0, 0) if area is None else area.topleft
+        for rect in self.regions():
+            clip = dest.clip(rect)
+            if clip:
+                self.screen.blit(surface, clip, clip.move(offset[0] - dest.x, offset[1] - dest.y))
+
+    def present(self):
+        if self.full:
+            pygame.display.update()
+        elif self.rects:
+            pygame.display.update(self.regions())
+        self.full = self._next_full
+        self._next_full = False
+        self.rects.clear()
+        self._merged = None
+
+
+def widget_rect(widget):
+    pad = 2 * getattr(widget, 'handleRadius', 0) + 4 # slider/toggle handles stick out
+    rect = pygame.Rect(widget.getX(), widget.getY(), widget.getWidth(), widget.getHeight())
+    return rect.inflate(pad, pad)
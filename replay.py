@@ -0,0 +1,225 @@
+import argparse
+import json
+import os
+import time
+
+import puzzles
+import scoring
+import solver
+from engine import MAX_RINGS, can_move, step
+from store import ScoreStore
+
+# compact replays of finished games, saved next to the score so a leaderboard entry can be
+# checked by playing it back, no pygame needed so whole boards verify in batch
+#
+# format, varints are unsigned LEB128:
+#   b'TCR' | version byte | flags byte (1 shuffled, 2 assisted)
+#   varint rings | varint start position (puzzles.state_index) | varint move count
+#   moves, 3 bits each packed from the low bit up (code = index into MOVES)
+#   varint ms since the previous move for every move, then varint ms from the last move to the end
+
+MAGIC = b'TCR'
+VERSION = 1
+SHUFFLED = 1
+ASSISTED = 2
+
+MOVES = [(source, target) for source in range(3) for target in range(3) if source != target] # code -> move
+CODES = {move: code for code, move in enumerate(MOVES)}
+BITS = 3
+
+
+class ReplayError(ValueError):
+    pass
+
+
+def write_varint(out, value):
+    while value > 0x7f:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data, pos): # (value, next pos)
+    value = shift = 0
+    while True:
+        if pos >= len(data):
+            raise ReplayError("Replay cut short")
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+class Replay:
+    def __init__(self, rings, start=0, shuffled=False):
+        self.rings = rings
+        self.start = start # state_index of the starting position, 0 is everything on the first peg
+        self.shuffled = bool(shuffled)
+        self.assisted = False
+        self.codes = bytearray() # one move code per move
+        self.times = [] # ms of game time when each move was made
+        self.end = None # ms of game time when it was solved
+
+    def record(self, source, target, seconds):
+        self.codes.append(CODES[(source, target)])
+        ms = round(seconds * 1000)
+        self.times.append(max(ms, self.times[-1]) if self.times else ms)
+
+    def finish(self, seconds, assisted=False): # bytes to save with the score
+        self.end = max(round(seconds * 1000), self.times[-1] if self.times else 0)
+        self.assisted = bool(assisted)
+        return self.encode()
+
+    def moves(self):
+        return [MOVES[code] for code in self.codes]
+
+    def encode(self):
+        out = bytearray(MAGIC)
+        out.append(VERSION)
+        out.append((SHUFFLED if self.shuffled else 0) | (ASSISTED if self.assisted else 0))
+        write_varint(out, self.rings)
+        write_varint(out, self.start)
+        write_varint(out, len(self.codes))
+        acc = bits = 0
+        for code in self.codes:
+            acc |= code << bits
+            bits += BITS
+            if bits >= 8:
+                out.append(acc & 0xff)
+                acc >>= 8
+                bits -= 8
+        if bits:
+            out.append(acc)
+        last = 0
+        for ms in self.times:
+            write_varint(out, ms - last)
+            last = ms
+        write_varint(out, (self.end or last) - last)
+        return bytes(out)
+
+    @staticmethod
+    def decode(data):
+        if data[:3] != MAGIC:
+            raise ReplayError("Not a replay")
+        if len(data) < 5 or data[3] != VERSION:
+            raise ReplayError(f"Unknown replay version {data[3] if len(data) > 3 else None}")
+        flags = data[4]
+        rings, pos = read_varint(data, 5)
+        if not 1 <= rings <= MAX_RINGS: # checked before anything sized by it gets built
+            raise ReplayError(f"Bad ring count {rings}")
+        start, pos = read_varint(data, pos)
+        count, pos = read_varint(data, pos)
+        replay = Replay(rings, start, flags & SHUFFLED)
+        replay.assisted = bool(flags & ASSISTED)
+        size = (count * BITS + 7) // 8
+        packed = data[pos:pos + size]
+        if len(packed) < size:
+            raise ReplayError("Replay cut short")
+        pos += size
+        codes = replay.codes
+        acc = bits = 0
+        for byte in packed:
+            acc |= byte << bits
+            bits += 8
+            while bits >= BITS and len(codes) < count:
+                codes.append(acc & 0b111)
+                acc >>= BITS
+                bits -= BITS
+        if codes and max(codes) >= len(MOVES):
+            raise ReplayError("Bad move code")
+        ms = 0
+        for _ in range(count):
+            delta, pos = read_varint(data, pos)
+            ms += delta
+            replay.times.append(ms)
+        delta, pos = read_varint(data, pos)
+        replay.end = ms + delta
+        if pos != len(data):
+            raise ReplayError("Trailing bytes after the replay")
+        return replay
+
+
+def verify(data, score=None, rings=None, shuffle=None):
+    # plays the replay back, returns the score it earns
+    # raises ReplayError if it isnt a legal, solved game or doesnt match what was claimed
+    replay = Replay.decode(data)
+    if rings is not None and replay.rings != rings:
+        raise ReplayError(f"Replay has {replay.rings} rings, entry says {rings}")
+    if shuffle is not None and replay.shuffled != bool(shuffle):
+        raise ReplayError("Shuffle mode doesnt match the entry")
+    if not replay.shuffled and replay.start != 0:
+        raise ReplayError("Classic game that didnt start on the first peg")
+    if replay.start >= 3 ** replay.rings:
+        raise ReplayError("Bad start position")
+    state = puzzles.from_index(replay.rings, replay.start)
+    min_moves = solver.distance(state)
+    if not min_moves:
+        raise ReplayError("Started out solved")
+
+    pegs = state.pegs # moved in place, HanoiState.apply would keep a history of every move
+    full = state.full
+    count = len(replay.codes)
+    for i, code in enumerate(replay.codes, 1):
+        source, target = MOVES[code]
+        if not can_move(pegs, source, target):
+            raise ReplayError(f"Illegal move {i}: {source} -> {target}")
+        step(pegs, source, target)
+        if pegs[2] == full and i != count:
+            raise ReplayError(f"Moves after the game was solved at move {i}")
+    if pegs[2] != full:
+        raise ReplayError("Game isnt solved")
+
+    result = scoring.classic(replay.rings, count, min_moves, replay.end / 1000, replay.assisted)
+    if score is not None and result != score:
+        raise ReplayError(f"Score {score} doesnt match the replay ({result})")
+    return result
+
+
+def audit(paths): # every replay in the given databases, .tcr files and folders of them
+    report = {"checked": 0, "valid": 0, "missing": 0, "invalid": []}
+
+    def check(source, data, **claim):
+        report["checked"] += 1
+        if data is None:
+            report["missing"] += 1 # saved before replays existed
+            return
+        try:
+            verify(data, **claim)
+            report["valid"] += 1
+        except ReplayError as e:
+            report["invalid"].append({"source": source, "error": str(e), **claim})
+
+    start = time.perf_counter()
+    for path in paths:
+        if os.path.isdir(path):
+            files = sorted(os.path.join(path, file) for file in os.listdir(path) if file.endswith('.tcr'))
+        else:
+            files = [path]
+        for file in files:
+            if file.endswith('.db'):
+                store = ScoreStore(file, legacy=None)
+                for entry, data in store.replays():
+                    check(f"{file}:{entry['name']}", data, score=entry['score'], rings=entry.get('rings'),
+                          shuffle=entry.get('shuffle'))
+                store.close()
+            else:
+                with open(file, 'rb') as f:
+                    check(file, f.read())
+    seconds = time.perf_counter() - start
+    report["seconds"] = round(seconds, 3)
+    report["per_second"] = round(report["checked"] / seconds) if seconds else None
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Verify Tower of Cats replays")
+    parser.add_argument('paths', nargs='*', default=['leaderboard.db'], help="score databases, .tcr files or folders")
+    args = parser.parse_args()
+    missing = [path for path in args.paths if not os.path.exists(path)]
+    if missing:
+        parser.error(f"not found: {', '.join(missing)}")
+    result = audit(args.paths)
+    print(json.dumps(result, indent=2))
+    raise SystemExit(1 if result["invalid"] else 0)
@@ -0,0 +1,55 @@
+import importlib
+
+# score formulas, pure python so the game, the replay verifier and bots all agree
+# times are in seconds rounded to the millisecond, which is what a replay stores
+# every formula takes (rings, moves, min_moves, seconds, assisted), the game uses classic,
+# the others are candidates to compare with simulate.py
+
+PAR_SECONDS = 1.0 # seconds a quick player spends on an optimal move
+
+
+def quantize(seconds): # to the millisecond, like a replay
+    return round(seconds * 1000) / 1000
+
+
+def classic(rings, moves, min_moves, seconds, assisted=False):
+    if assisted: # autoplay solved it, not the player
+        return 0
+    # only moves above the optimum from this start count, so shuffled boards compare fairly
+    moves = moves - min_moves
+    base = 1000
+    super_base = rings * base
+    score = super_base - (((seconds * (moves + 1)) + (moves / 2)) ** 0.5)
+    return max(0, int(score))
+
+
+def efficiency(rings, moves, min_moves, seconds, assisted=False):
+    # the base scaled by how close to optimal the moves were, half of it also by the time
+    if assisted:
+        return 0
+    base = rings * 1000
+    move_factor = min_moves / max(moves, min_moves, 1)
+    par = min_moves * PAR_SECONDS
+    time_factor = min(1, par / seconds) if seconds > 0 else 1
+    return int(base * move_factor * (0.5 + 0.5 * time_factor))
+
+
+def par(rings, moves, min_moves, seconds, assisted=False):
+    # flat penalties, 20 for every wasted move and 5 for every second over par
+    if assisted:
+        return 0
+    wasted = moves - min_moves
+    late = max(0, seconds - min_moves * PAR_SECONDS)
+    return max(0, int(rings * 1000 - 20 * wasted - 5 * late))
+
+
+FORMULAS = {'classic': classic, 'efficiency': efficiency, 'par': par}
+
+
+def formula(name): # a name from FORMULAS or module:function
+    if name in FORMULAS:
+        return FORMULAS[name]
+    module, sep, attr = name.partition(':')
+    if not sep:
+        raise ValueError(f"Unknown scoring formula {name}, use one of {', '.join(FORMULAS)} or module:function")
+    return getattr(importlib.import_module(module), attr)
@@ -0,0 +1,205 @@
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+import puzzles
+import scoring
+import solver
+from engine import HanoiState, legal_moves, step
+from puzzles import DEFAULT_DIFFICULTY
+
+# batch simulator for tuning the score formula, bots play lots of games headless across
+# a process pool and every game is scored with each formula asked for
+# python simulate.py --games 20000 --scoring classic efficiency par > scores.json
+# games are split in chunks seeded by (seed, policy, rings, shuffle, chunk), so the
+# results are the same whatever --jobs is
+
+# policies, move(state, rng, error) -> (source, target)
+def optimal(state, rng, error):
+    return solver.next_move(state)
+
+
+def noisy(state, rng, error): # optimal, but a random other legal move error of the time
+    best = solver.next_move(state)
+    if rng.random() < error:
+        moves = [move for move in legal_moves(state.pegs) if move != best]
+        if moves:
+            return rng.choice(moves)
+    return best
+
+
+def random_legal(state, rng, error):
+    return rng.choice(legal_moves(state.pegs))
+
+
+POLICIES = {'optimal': optimal, 'noisy': noisy, 'random': random_legal}
+
+
+class ThinkTime:
+    # seconds per move, lognormal around a median that grows with the ring count,
+    # players slow down on bigger towers and now and then stop to think
+    def __init__(self, median=0.8, per_ring=0.1, sigma=0.5):
+        self.median = median
+        self.per_ring = per_ring
+        self.sigma = sigma
+
+    def sampler(self, rings, rng):
+        mu = math.log(self.median + self.per_ring * rings)
+        sigma = self.sigma
+        if not sigma:
+            value = math.exp(mu)
+            return lambda: value
+        return lambda: rng.lognormvariate(mu, sigma)
+
+
+def play(policy, rings, shuffle, rng, think, error=0.1, difficulty=DEFAULT_DIFFICULTY, max_factor=20):
+    # one game, (solved, moves, min_moves, seconds), gives up after max_factor * min_moves moves
+    state = puzzles.generate(rings, difficulty, rng=rng) if shuffle else HanoiState(rings)
+    min_moves = solver.distance(state)
+    limit = max_factor * min_moves
+    move = POLICIES[policy]
+    pause = think.sampler(rings, rng)
+    pegs = state.pegs
+    full = state.full
+    moves = 0
+    seconds = 0.0
+    while pegs[2] != full and moves < limit:
+        step(pegs, *move(state, rng, error))
+        moves += 1
+        seconds += pause()
+    return pegs[2] == full, moves, min_moves, seconds
+
+
+def run_chunk(task): # worker side, plain types in and out so it pickles cheaply
+    rng = random.Random(task['seed'])
+    think = ThinkTime(*task['think'])
+    formulas = [scoring.formula(name) for name in task['scoring']]
+    scores = [array('d') for _ in formulas] # a formula can score in floats
+    moves = array('q')
+    seconds = array('d')
+    solved = 0
+    for _ in range(task['games']):
+        done, count, min_moves, spent = play(task['policy'], task['rings'], task['shuffle'], rng, think,
+                                             task['error'], task['difficulty'], task['max_factor'])
+        spent = scoring.quantize(spent)
+        moves.append(count)
+        seconds.append(spent)
+        if done:
+            solved += 1
+        for out, score in zip(scores, formulas):
+            out.append(score(task['rings'], count, min_moves, spent) if done else 0) # a quitter scores nothing
+    return task['group'], solved, moves, seconds, scores
+
+
+def tasks(args):
+    think = (args.think, args.think_per_ring, args.think_sigma)
+    for policy in args.policy:
+        for rings in args.rings:
+            for shuffle in {'off': (False,), 'on': (True,), 'both': (False, True)}[args.shuffle]:
+                group = (policy, rings, shuffle)
+                for chunk, start in enumerate(range(0, args.games, args.chunk)):
+                    yield {'group': group, 'seed': f"{args.seed}:{policy}:{rings}:{shuffle}:{chunk}",
+                           'games': min(args.chunk, args.games - start), 'policy': policy, 'rings': rings,
+                           'shuffle': shuffle, 'think': think, 'error': args.error, 'difficulty': args.difficulty,
+                           'max_factor': args.max_factor, 'scoring': args.scoring}
+
+
+def distribution(values, bins=20): # summary stats and an equal width histogram
+    values = sorted(values)
+    n = len(values)
+    if not n:
+        return {"count": 0}
+    mean = sum(values) / n
+    spread = math.sqrt(sum((v - mean) ** 2 for v in values) / n)
+
+    def pct(p):
+        return values[min(n - 1, int(p * n))]
+    low, high = values[0], values[-1]
+    width = (high - low) / bins or 1
+    counts = [0] * bins
+    for v in values:
+        counts[min(bins - 1, int((v - low) / width))] += 1
+    return {"count": n, "mean": round(mean, 3), "stdev": round(spread, 3), "min": low, "p5": pct(0.05),
+            "p25": pct(0.25), "p50": pct(0.5), "p75": pct(0.75), "p95": pct(0.95), "max": high,
+            "zero": sum(1 for v in values if v == 0) / n,
+            "histogram": {"low": low, "width": round(width, 3), "counts": counts}}
+
+
+def simulate(args):
+    merged = {} # group -> [solved, moves, seconds, [scores per formula]]
+    work = list(tasks(args))
+    if args.jobs == 1:
+        results = map(run_chunk, work)
+    else:
+        pool = ProcessPoolExecutor(args.jobs)
+        results = pool.map(run_chunk, work)
+    for group, solved, moves, seconds, scores in results:
+        entry = merged.setdefault(group, [0, array('q'), array('d'), [array('d') for _ in args.scoring]])
+        entry[0] += solved
+        entry[1].extend(moves)
+        entry[2].extend(seconds)
+        for out, chunk in zip(entry[3], scores):
+            out.extend(chunk)
+    if args.jobs != 1:
+        pool.shutdown()
+
+    groups = []
+    for (policy, rings, shuffle), (solved, moves, seconds, scores) in merged.items():
+        groups.append({
+            "policy": policy, "rings": rings, "shuffle": shuffle, "games": len(moves), "solved": solved / len(moves),
+            "moves": distribution(moves, args.bins), "seconds": distribution(seconds, args.bins),
+            "scores": {name: distribution(values, args.bins) for name, values in zip(args.scoring, scores)},
+        })
+    return groups
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Simulate Tower of Cats games with bots and compare score formulas")
+    parser.add_argument('--games', type=int, default=2000, help="games per policy, ring count and shuffle mode")
+    parser.add_argument('--rings', type=int, nargs='+', default=list(range(3, 10)))
+    parser.add_argument('--shuffle', choices=('off', 'on', 'both'), default='both')
+    parser.add_argument('--policy', nargs='+', choices=list(POLICIES), default=list(POLICIES))
+    parser.add_argument('--error', type=float, default=0.1, help="chance the noisy bot makes a random move")
+    parser.add_argument('--think', type=float, default=0.8, help="median seconds per move")
+    parser.add_argument('--think-per-ring', type=float, default=0.1, help="extra median seconds per move for every ring")
+    parser.add_argument('--think-sigma', type=float, default=0.5, help="lognormal spread of the think time, 0 is constant")
+    parser.add_argument('--difficulty', type=float, default=DEFAULT_DIFFICULTY, help="shuffled start distance, fraction of the longest")
+    parser.add_argument('--max-factor', type=int, default=20, help="a bot gives up after this many times the optimal moves")
+    parser.add_argument('--scoring', nargs='+', default=list(scoring.FORMULAS),
+                        help="formulas to compare: " + ", ".join(scoring.FORMULAS) + " or module:function")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help="worker processes, 1 runs inline")
+    parser.add_argument('--chunk', type=int, default=250, help="games per task")
+    parser.add_argument('--seed', default='0')
+    parser.add_argument('--bins', type=int, default=20, help="histogram bins")
+    parser.add_argument('--out', help="write the JSON here instead of stdout")
+    args = parser.parse_args()
+    for name in args.scoring:
+        try:
+            scoring.formula(name)
+        except (ValueError, ImportError, AttributeError) as e:
+            parser.error(str(e))
+
+    start = time.perf_counter()
+    groups = simulate(args)
+    seconds = time.perf_counter() - start
+    total = sum(group["games"] for group in groups)
+    output = {
+        "meta": {"games": total, "jobs": args.jobs, "seconds": round(seconds, 3),
+                 "games_per_second": round(total / seconds) if seconds else None, "seed": args.seed,
+                 "think": {"median": args.think, "per_ring": args.think_per_ring, "sigma": args.think_sigma},
+                 "error": args.error, "difficulty": args.difficulty, "scoring": args.scoring},
+        "groups": groups,
+    }
+    text = json.dumps(output, indent=2)
+    if args.out:
+        with open(args.out, 'w') as file:
+            file.write(text)
+    else:
+        print(text)
+    print(f"{total} games in {seconds:.2f}s on {args.jobs} processes", file=sys.stderr)
@@ -0,0 +1,52 @@
+# optimal solver from any legal position, works on engine.HanoiState
+# walk the rings from the biggest down keeping track of where each one has to go:
+# if ring k isnt on its target it has to move there, and everything smaller
+# first has to get out of the way onto the third peg
+
+
+def plan(state, goal=None): # [(ring, source, target)] for every ring that has to move, biggest first
+    if goal is None:
+        goal = len(state.pegs) - 1
+    pegs = state.pegs
+    steps = []
+    target = goal
+    for ring in range(state.rings, 0, -1):
+        bit = 1 << (ring - 1)
+        source = 0 if pegs[0] & bit else 1 if pegs[1] & bit else 2
+        if source != target:
+            steps.append((ring, source, target))
+            target = 3 - source - target
+    return steps
+
+
+def next_move(state, goal=None): # O(rings), None when solved
+    steps = plan(state, goal)
+    if not steps:
+        return None
+    ring, source, target = steps[-1]
+    return source, target
+
+
+def distance(state, goal=None): # optimal number of moves left
+    return sum(1 << (ring - 1) for ring, source, target in plan(state, goal))
+
+
+def tower_moves(rings, source, target):
+    # moves a whole tower without recursion, move m of the classic solution
+    # goes from (m & m-1) % 3 to ((m | m-1) + 1) % 3 between pegs 0, 1, 2
+    if rings <= 0:
+        return
+    spare = 3 - source - target
+    if rings % 2: # odd towers end on peg 2 of the formula, even ones on peg 1
+        peg = (source, spare, target)
+    else:
+        peg = (source, target, spare)
+    for m in range(1, 1 << rings):
+        yield peg[(m & (m - 1)) % 3], peg[((m | (m - 1)) + 1) % 3]
+
+
+def solution(state, goal=None):
+    # the full optimal sequence, generated lazily so memory stays flat even for 2^n moves
+    for ring, source, target in reversed(plan(state, goal)):
+        yield source, target
+        yield from tower_moves(ring - 1, 3 - source - target, target)
@@ -1,164 +1,115 @@
-class Node:
-    def __init__(self, data):
-        self.data = data
-        self.next = None
-
-
 class Stack:
+    # list backed, top of the stack is the end of the list
+    # _pos maps data -> index of its first occurrence so getIndex is O(1)
+    __slots__ = ('_items', '_pos')
+
     def __init__(self):
-        self.head = None
-    
+        self._items = []
+        self._pos = {}
+
     def insert(self, data):
-        if self.head == None:
-            self.head = Node(data)
-            return
-        current = self.head
-        while current.next != None:
-            current = current.next
-        
-        current.next = Node(data)
-    
+        self._items.append(data)
+        try:
+            self._pos.setdefault(data, len(self._items) - 1)
+        except TypeError: # unhashable, getIndex falls back to a scan
+            pass
+
     def get(self):
-        if self.head == None:
+        if not self._items:
             return
-        if self.head.next == None:
-            data = self.head.data
-            self.head = None
-            return data
-        current = self.head
-        while current.next.next != None:
-            current = current.next
-        
-        data = current.next.data
-        current.next = current.next.next
+        data = self._items.pop()
+        try:
+            if self._pos.get(data) == len(self._items):
+                del self._pos[data]
+        except TypeError:
+            pass
         return data
-    
+
     def popleft(self):
-        if self.head == None:
+        if not self._items:
             return
 
-        data = self.head.data
-        self.head = self.head.next
+        data = self._items.pop(0)
+        self._reindex()
         return data
-    
+
+    def _reindex(self):
+        self._pos = {}
+        for i, data in enumerate(self._items):
+            try:
+                self._pos.setdefault(data, i)
+            except TypeError:
+                pass
+
     def show(self):
-        if self.head == None:
+        if not self._items:
             return
-        string = ''
-        current = self.head
-        while current != None:
-            string += str(current.data)+'->'
-            current = current.next
-        return string
+        return ''.join(str(data)+'->' for data in self._items)
 
     def getIndex(self, data):
-        if self.head == None:
+        if not self._items:
             return
 
-        current = self.head
-        i=0
-        while current and current.data != data:
-            current = current.next
-            i+=1
-        if current is None: raise IndexError("Out of bounds")
+        try:
+            i = self._pos.get(data)
+        except TypeError:
+            i = None
+        if i is None:
+            # unhashable or missing, same linear search as before
+            for i, current in enumerate(self._items):
+                if current == data:
+                    return i
+            raise IndexError("Out of bounds")
         return i
 
     def get_by_index(self, index):
-        if index < 0 or index >= len(self):
+        if index < 0 or index >= len(self._items):
             raise IndexError("Index out of bounds")
-        current = self.head
-        for _ in range(index):
-            current = current.next
-        return current.data
+        return self._items[index]
 
     def index(self, index):
-        if self.head == None:
+        if not self._items:
             return
 
-        current = self.head
-        i=0
-        while i != index and current:
-            current = current.next
-            i+=1
-        if current == None: raise IndexError("Not found")
+        if index < 0 or index >= len(self._items): raise IndexError("Not found")
+
+        return self._items[index]
 
-        return current.data
     def copy(self):
-        if self.head == None:
+        if not self._items:
             return
         new_stack = Stack()
-        current = self.head
-        while current:
-            new_stack.insert(current.data)
-            current = current.next
+        new_stack._items = self._items.copy()
+        new_stack._pos = self._pos.copy()
         return new_stack
-    
+
     def getLast(self):
-        if self.head == None:
+        if not self._items:
             return
-        current = self.head
-        if current.next == None:
-            return current.data
-        
-        while current.next:
-            current = current.next
-        
-        return current.data
-    
+        return self._items[-1]
+
     def __eq__(self, other):
         if not isinstance(other, Stack):
             return False
-        if self.head == None and other.head == None:
-            return True
-        current = self.head
-        other_current = other.head
-        while current and other_current:
-            if current.data != other_current.data:
-                return False
-            current = current.next
-            other_current = other_current.next
-        return current == None and other_current == None
-    
+        return self._items == other._items
+
     def __str__(self):
-        if self.head == None:
+        if not self._items:
             return 'None'
         return self.show()
 
     def __bool__(self):
-        if self.head:
-            return True
-        return False
-    
+        return bool(self._items)
+
     def __iter__(self):
-        if self.head == None:
-            return
-        
-        current = self.head
-        while current:
-            yield current.data
-            current = current.next
-    
+        return iter(self._items)
+
     def __len__(self):
-        i = 0
-        current = self.head
-        while current:
-            current = current.next
-            i+=1
-        
-        return i
-    
-    def inverse(self):
-        if self.head == None:
-            return
-        
-        beta = Stack()
-        current = self.head
-        while current:
-            beta.insert(current.data)
-            current = current.next
-        while beta:
-            yield beta.get()
-        
+        return len(self._items)
+
+    def inverse(self): # top to bottom, no copy
+        return reversed(self._items)
+
 
 if __name__ == '__main__':
     a = Stack()
@@ -166,4 +117,4 @@ if __name__ == '__main__':
     a.insert(5)
     a.insert(3)
     a.insert(7)
-    print(a.getLast())
\ No newline at end of file
+    print(a.getLast())
@@ -0,0 +1,82 @@
+import builtins
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# where the time to the first frame goes, printed with --startup-report
+# main.py imports this first and turns on track_imports() so every import after it gets
+# timed, top level only, the imports a module makes itself count towards that module
+
+
+class StartupReport:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.imports = [] # (module, ms)
+        self.stages = [] # (stage, ms)
+        self.assets = [] # (kind, path, ms, thread), appended from the loader threads too
+        self.marks = {} # name -> ms since start
+        self._import = None
+        self._depth = 0
+        self._thread = threading.get_ident()
+
+    def now(self): # ms since start
+        return (time.perf_counter() - self.start) * 1000
+
+    def track_imports(self):
+        original = self._import = builtins.__import__
+
+        def timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+            if self._depth or level or name in sys.modules or threading.get_ident() != self._thread:
+                return original(name, globals, locals, fromlist, level)
+            self._depth += 1
+            start = time.perf_counter()
+            try:
+                return original(name, globals, locals, fromlist, level)
+            finally:
+                self._depth -= 1
+                self.imports.append((name, (time.perf_counter() - start) * 1000))
+        builtins.__import__ = timed_import
+
+    def stop_imports(self):
+        if self._import:
+            builtins.__import__ = self._import
+            self._import = None
+        self.mark('imports')
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages.append((name, (time.perf_counter() - start) * 1000))
+
+    @contextmanager
+    def asset(self, kind, path):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.assets.append((kind, path, (time.perf_counter() - start) * 1000, threading.current_thread().name))
+
+    def mark(self, name): # first one wins
+        self.marks.setdefault(name, self.now())
+
+    def summary(self):
+        def ms(value):
+            return round(value, 3)
+        return {
+            "marks": {name: ms(at) for name, at in self.marks.items()},
+            "imports": [{"module": name, "ms": ms(t)} for name, t in sorted(self.imports, key=lambda i: -i[1])],
+            "stages": [{"stage": name, "ms": ms(t)} for name, t in self.stages],
+            "assets": [{"kind": kind, "path": path, "ms": ms(t), "thread": thread}
+                       for kind, path, t, thread in sorted(self.assets, key=lambda a: -a[2])],
+        }
+
+    def print(self):
+        print(json.dumps(self.summary(), indent=2))
+
+
+report = StartupReport()
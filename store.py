@@ -0,0 +1,148 @@
+import json
+import os
+import sqlite3
+import threading
+
+# leaderboard storage, sqlite in WAL mode instead of rewriting leaderboard.json on every save
+# one row per name per mode, a save only replaces the row if the new score is higher
+# mode is (rings, shuffle), old entries without one are stored as rings 0 / shuffle 0
+# and handed back as (None, None)
+# every row can carry the replay (replay.py) of the game that set its score
+# with a writer (writer.py) saves are committed on its thread, until then they sit in
+# pending and every read here already includes them, a save itself doesnt touch the
+# database so the render thread never waits on the disk
+
+DB_PATH = 'leaderboard.db'
+JSON_PATH = 'leaderboard.json'
+SCHEMA_VERSION = 2 # 2 added replays
+
+
+class ScoreStore:
+    def __init__(self, path=DB_PATH, legacy=JSON_PATH, writer=None):
+        self.path = path
+        self.writer = writer
+        self.lock = threading.RLock() # the connection is shared with the writer thread
+        self.pending = {} # (name, rings, shuffle) row key -> (score, replay) not committed yet
+        self.pending_lock = threading.Lock() # only around pending, a save never waits for a commit
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL') # WAL keeps this crash safe
+        with self.conn:
+            self.conn.execute('''CREATE TABLE IF NOT EXISTS scores (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                rings INTEGER NOT NULL DEFAULT 0,
+                shuffle INTEGER NOT NULL DEFAULT 0,
+                score INTEGER NOT NULL,
+                replay BLOB)''')
+            self.conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS scores_name ON scores (name, rings, shuffle)')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS scores_mode ON scores (rings, shuffle, score DESC)')
+        version = self.version()
+        if version < 1:
+            self.import_json(legacy)
+        elif version < 2:
+            with self.conn:
+                self.conn.execute('ALTER TABLE scores ADD COLUMN replay BLOB')
+                self.conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+    def version(self):
+        return self.conn.execute('PRAGMA user_version').fetchone()[0]
+
+    def import_json(self, path): # one time, the old file is left alone
+        entries = []
+        if path and os.path.exists(path):
+            with open(path, 'r') as file:
+                entries = json.load(file)
+        with self.conn: # one transaction, all or nothing
+            for entry in entries:
+                self._upsert(entry['name'], entry['score'], entry.get('rings'), entry.get('shuffle'))
+            self.conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+    def _upsert(self, name, score, rings, shuffle, replay=None):
+        self.conn.execute('''INSERT INTO scores (name, rings, shuffle, score, replay) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (name, rings, shuffle) DO UPDATE SET score = excluded.score, replay = excluded.replay
+            WHERE excluded.score > scores.score''', (name, *to_row(rings, shuffle), score, replay))
+
+    def save(self, name, score, rings=None, shuffle=None, replay=None):
+        # the upsert keeps the higher score, returns the entry as far as the queued saves know
+        # (tree.Leaderboards knows the saved one too)
+        key = (name, *to_row(rings, shuffle))
+        if self.writer is None:
+            with self.lock, self.conn:
+                self._upsert(name, score, rings, shuffle, replay)
+            return entry(name, score, rings, shuffle)
+        with self.pending_lock:
+            pending = self.pending.get(key)
+            if pending is not None and pending[0] >= score: # already queued with a better one
+                return entry(name, pending[0], rings, shuffle)
+            self.pending[key] = (score, replay)
+        self.writer.submit(('score',) + key, lambda: self._commit(key))
+        return entry(name, score, rings, shuffle)
+
+    def _commit(self, key): # runs on the writer thread
+        with self.lock:
+            with self.pending_lock:
+                pending = self.pending.pop(key, None)
+            if pending is not None:
+                score, replay = pending
+                with self.conn:
+                    self._upsert(key[0], score, *from_row(key[1], key[2]), replay)
+
+    def modes(self):
+        with self.lock:
+            rows = set(self.conn.execute('SELECT DISTINCT rings, shuffle FROM scores').fetchall())
+            with self.pending_lock:
+                rows.update(key[1:] for key in self.pending)
+        return [from_row(rings, shuffle) for rings, shuffle in rows]
+
+    def entries(self, rings=None, shuffle=None): # every entry of one mode, highest first
+        mode = to_row(rings, shuffle)
+        with self.lock:
+            rows = self.conn.execute('SELECT name, score FROM scores WHERE rings = ? AND shuffle = ? ORDER BY score DESC',
+                                     mode).fetchall()
+            with self.pending_lock:
+                pending = {key[0]: score for key, (score, replay) in self.pending.items() if key[1:] == mode}
+        if pending:
+            rows = [(name, max(score, pending.pop(name, score))) for name, score in rows] + list(pending.items())
+            rows.sort(key=lambda row: row[1], reverse=True)
+        for name, score in rows:
+            yield entry(name, score, rings, shuffle)
+
+    def all(self):
+        for mode in self.modes():
+            yield from self.entries(*mode)
+
+    def replays(self): # (entry, replay or None) for every saved score, for audits
+        if self.writer:
+            self.writer.flush()
+        with self.lock:
+            rows = self.conn.execute('SELECT name, rings, shuffle, score, replay FROM scores').fetchall()
+        for name, rings, shuffle, score, replay in rows:
+            yield entry(name, score, *from_row(rings, shuffle)), replay
+
+    def count(self, rings=None, shuffle=None):
+        return sum(1 for _ in self.entries(rings, shuffle))
+
+    def close(self):
+        if self.writer:
+            self.writer.flush()
+        with self.lock:
+            self.conn.close()
+
+
+def to_row(rings, shuffle):
+    return (rings or 0, int(bool(shuffle)) if rings else 0)
+
+
+def from_row(rings, shuffle):
+    if not rings:
+        return None, None
+    return rings, bool(shuffle)
+
+
+def entry(name, score, rings, shuffle):
+    data = {"name": name, "score": score}
+    if rings is not None:
+        data["rings"] = rings
+        data["shuffle"] = shuffle
+    return data
@@ -0,0 +1,62 @@
+import pytest
+
+from engine import HanoiState, IllegalMove, can_move, legal_moves, step
+
+
+def test_start():
+    state = HanoiState(3)
+    assert state.peg_lists() == [[3, 2, 1], [], []]
+    assert state.top(0) == 1 and state.top(1) == 0
+    assert not state.is_solved()
+    assert state.legal_moves() == [(0, 1), (0, 2)]
+
+
+def test_legal():
+    state = HanoiState.from_pegs([[3], [2], [1]])
+    assert state.legal(2, 0) and state.legal(2, 1) and state.legal(1, 0)
+    assert not state.legal(0, 1) # bigger on smaller
+    assert not state.legal(1, 1)
+    assert not HanoiState.from_pegs([[2, 1], [], []]).legal(1, 0) # empty source
+
+
+def test_apply_and_undo():
+    state = HanoiState(3)
+    assert state.apply(0, 2) == 1 # returns the ring that moved
+    assert state.apply(0, 1) == 2
+    assert state.peg_lists() == [[3], [2], [1]]
+    assert state.moves == 2 and state.history == [(0, 2), (0, 1)]
+    with pytest.raises(IllegalMove):
+        state.apply(0, 1)
+    assert state.moves == 2 # a refused move changes nothing
+    assert state.undo() == (0, 1)
+    assert state.undo() == (0, 2)
+    assert state == HanoiState(3) and state.moves == 0
+    with pytest.raises(IndexError):
+        state.undo()
+
+
+def test_copy_is_independent():
+    state = HanoiState(3)
+    state.apply(0, 2)
+    other = state.copy()
+    other.apply(0, 1)
+    assert state.moves == 1 and state.peg_lists() == [[3, 2], [], [1]]
+
+
+def test_from_pegs_rejects_bad_boards():
+    for pegs in ([[1], [1], []], [[3, 2], [], []], [[4, 2, 1], [], []]):
+        with pytest.raises(ValueError):
+            HanoiState.from_pegs(pegs, 3)
+
+
+def test_peg_mask_rules_match_the_state():
+    # the bare mask functions the replay checker and the simulator use
+    state = HanoiState.from_pegs([[4, 1], [3], [2]])
+    pegs = state.pegs.copy()
+    assert legal_moves(pegs) == state.legal_moves()
+    for source in range(3):
+        for target in range(3):
+            assert can_move(pegs, source, target) == state.legal(source, target)
+    assert step(pegs, 0, 1) == 1
+    state.apply(0, 1)
+    assert pegs == state.pegs
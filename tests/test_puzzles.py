@@ -0,0 +1,48 @@
+import random
+
+import pytest
+
+import puzzles
+import solver
+
+
+@pytest.mark.parametrize('rings', range(1, 7))
+def test_random_state_hits_every_distance(rings):
+    rng = random.Random(rings)
+    for distance in range(puzzles.max_distance(rings) + 1):
+        state = puzzles.random_state(rings, distance, rng)
+        assert solver.distance(state) == distance
+
+
+def test_random_state_big_towers():
+    rng = random.Random(1)
+    for rings in (20, 64):
+        for _ in range(20):
+            distance = rng.randint(0, puzzles.max_distance(rings))
+            assert solver.distance(puzzles.random_state(rings, distance, rng)) == distance
+
+
+def test_random_state_out_of_range():
+    with pytest.raises(ValueError):
+        puzzles.random_state(3, 8)
+    with pytest.raises(ValueError):
+        puzzles.random_state(3, -1)
+
+
+def test_generate_is_never_solved():
+    rng = random.Random(2)
+    for rings in (1, 3, 9):
+        for difficulty in (0, 0.5, 1):
+            assert solver.distance(puzzles.generate(rings, difficulty, rng=rng)) >= 1
+
+
+def test_state_index_round_trip():
+    rng = random.Random(3)
+    for rings in (1, 4, 9):
+        for _ in range(50):
+            state = puzzles.random_state(rings, rng.randint(0, puzzles.max_distance(rings)), rng)
+            index = puzzles.state_index(state)
+            assert 0 <= index < 3 ** rings
+            assert puzzles.from_index(rings, index) == state
+    with pytest.raises(ValueError):
+        puzzles.from_index(2, 9)
@@ -0,0 +1,104 @@
+import pytest
+
+import puzzles
+import replay
+import scoring
+import solver
+from engine import MAX_RINGS
+from replay import Replay, ReplayError, verify
+
+
+def solved(rings=3, start=None, seconds=0.7): # a replay of an optimal game, times seconds apart
+    state = puzzles.from_index(rings, start or 0)
+    record = Replay(rings, start or 0, start is not None)
+    for i, move in enumerate(solver.solution(state.copy()), 1):
+        record.record(*move, i * seconds)
+    return record
+
+
+def header(rings, start=0, count=0, flags=0): # hand built bytes up to the moves
+    out = bytearray(replay.MAGIC)
+    out += bytes((replay.VERSION, flags))
+    for value in (rings, start, count):
+        replay.write_varint(out, value)
+    return out
+
+
+def test_varint_round_trip():
+    for value in (0, 1, 127, 128, 300, 2 ** 40):
+        out = bytearray()
+        replay.write_varint(out, value)
+        assert replay.read_varint(out, 0) == (value, len(out))
+
+
+def test_round_trip():
+    start = puzzles.state_index(puzzles.random_state(5, 20))
+    record = solved(5, start)
+    record.record(*solver.next_move(puzzles.from_index(5, start)), 100) # codes dont have to be legal to encode
+    data = record.finish(123.4567, assisted=True)
+    decoded = Replay.decode(data)
+    assert (decoded.rings, decoded.start, decoded.shuffled, decoded.assisted) == (5, start, True, True)
+    assert decoded.codes == record.codes
+    assert decoded.moves() == record.moves()
+    assert decoded.times == record.times
+    assert decoded.end == 123457
+
+
+def test_verify_scores_like_the_game():
+    record = solved(4)
+    data = record.finish(20.0)
+    assert verify(data) == scoring.classic(4, 15, 15, 20.0)
+    assert verify(data, score=verify(data), rings=4, shuffle=False) == verify(data)
+    assert verify(solved(4).finish(20.0, assisted=True)) == 0
+
+
+@pytest.mark.parametrize('claim', [{'score': 1}, {'rings': 5}, {'shuffle': True}])
+def test_verify_checks_the_claim(claim):
+    with pytest.raises(ReplayError):
+        verify(solved(4).finish(20.0), **claim)
+
+
+def test_verify_rejects_illegal_moves():
+    record = Replay(3)
+    for move in [(0, 2), (0, 2)]: # ring 2 onto ring 1
+        record.record(*move, 1)
+    with pytest.raises(ReplayError, match="Illegal move 2"):
+        verify(record.finish(2))
+
+
+def test_verify_rejects_unsolved_and_overlong_games():
+    record = solved(3)
+    record.codes.pop()
+    record.times.pop()
+    with pytest.raises(ReplayError, match="isnt solved"):
+        verify(record.finish(10))
+    record = solved(3)
+    record.record(2, 1, 10)
+    with pytest.raises(ReplayError, match="after the game was solved"):
+        verify(record.finish(10))
+
+
+def test_verify_rejects_crafted_headers():
+    with pytest.raises(ReplayError, match="ring count"):
+        verify(bytes(header(3_000_000, count=1) + b'\x00\x00\x00'))
+    with pytest.raises(ReplayError, match="ring count"):
+        verify(bytes(header(0) + b'\x00'))
+    with pytest.raises(ReplayError, match="ring count"):
+        verify(bytes(header(MAX_RINGS + 1) + b'\x00'))
+    with pytest.raises(ReplayError, match="start position"):
+        verify(bytes(header(3, start=27, flags=replay.SHUFFLED) + b'\x00'))
+    with pytest.raises(ReplayError, match="first peg"):
+        verify(bytes(header(3, start=1) + b'\x00'))
+    with pytest.raises(ReplayError, match="cut short"):
+        verify(bytes(header(3, count=1_000_000)))
+
+
+def test_decode_rejects_broken_bytes():
+    data = solved(3).finish(5)
+    for broken in (b'', b'XYZ' + data[3:], data[:3] + b'\x09' + data[4:], data[:-1], data + b'\x00'):
+        with pytest.raises(ReplayError):
+            Replay.decode(broken)
+    bad = bytearray(header(3, count=1))
+    bad += b'\x07\x00\x00' # code 7 isnt a move
+    with pytest.raises(ReplayError, match="Bad move code"):
+        Replay.decode(bytes(bad))
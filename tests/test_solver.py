@@ -0,0 +1,56 @@
+from collections import deque
+
+import pytest
+
+import puzzles
+import solver
+from engine import HanoiState
+
+
+def bfs_distances(rings): # state index -> fewest moves to everything on peg 2, searched backwards from the goal
+    goal = HanoiState(rings, start=2)
+    distances = {puzzles.state_index(goal): 0}
+    queue = deque([goal])
+    while queue:
+        state = queue.popleft()
+        for move in state.legal_moves(): # moves are reversible, so forward moves walk the reverse graph too
+            nxt = state.copy()
+            nxt.apply(*move)
+            index = puzzles.state_index(nxt)
+            if index not in distances:
+                distances[index] = distances[puzzles.state_index(state)] + 1
+                queue.append(nxt)
+    return distances
+
+
+@pytest.mark.parametrize('rings', range(1, 6))
+def test_distance_matches_bfs(rings):
+    distances = bfs_distances(rings)
+    assert len(distances) == 3 ** rings
+    for index, expected in distances.items():
+        assert solver.distance(puzzles.from_index(rings, index)) == expected
+
+
+@pytest.mark.parametrize('rings', range(1, 5))
+def test_next_move_is_optimal(rings):
+    distances = bfs_distances(rings)
+    for index, expected in distances.items():
+        state = puzzles.from_index(rings, index)
+        move = solver.next_move(state)
+        if expected == 0:
+            assert move is None
+            continue
+        state.apply(*move)
+        assert distances[puzzles.state_index(state)] == expected - 1
+
+
+@pytest.mark.parametrize('rings', (1, 3, 8))
+def test_solution_solves_in_the_fewest_moves(rings):
+    state = puzzles.random_state(rings, puzzles.max_distance(rings) // 3 + 1)
+    expected = solver.distance(state)
+    moves = 0
+    for move in solver.solution(state.copy()):
+        state.apply(*move)
+        moves += 1
+    assert moves == expected
+    assert state.is_solved()
@@ -1,54 +1,163 @@
-import json
-import os
+import threading
 
 from stack import Stack # literally my stack :>
+from store import ScoreStore, entry, from_row, to_row
 # specifically for tower of hanoi leaderboard ....
+# AVL tree so sorted scores dont turn it into a linked list, every node also
+# caches its subtree size, traversals use an explicit stack instead of recursion
+# ordered by score then name, a name is only once on a board so an entry can be found to delete
 class Node:
+    __slots__ = ('data', 'left', 'right', 'height', 'size') # a big board is mostly nodes, no dict each
+
     def __init__(self, data):
         self.data = data
         self.left = self.right = None
+        self.height = 1
+        self.size = 1
+
+
+def height(node):
+    return node.height if node else 0
+
+
+def size(node):
+    return node.size if node else 0
+
+
+def update(node):
+    node.height = 1 + max(height(node.left), height(node.right))
+    node.size = 1 + size(node.left) + size(node.right)
+
+
+def rotate_right(node):
+    top = node.left
+    node.left = top.right
+    top.right = node
+    update(node)
+    update(top)
+    return top
+
+
+def rotate_left(node):
+    top = node.right
+    node.right = top.left
+    top.left = node
+    update(node)
+    update(top)
+    return top
+
+
+def key(data):
+    return data['score'], data.get('name', '')
+
+
+def balance(node): # returns the new root of this subtree
+    update(node)
+    diff = height(node.left) - height(node.right)
+    if diff > 1:
+        if height(node.left.left) < height(node.left.right):
+            node.left = rotate_left(node.left)
+        return rotate_right(node)
+    if diff < -1:
+        if height(node.right.right) < height(node.right.left):
+            node.right = rotate_right(node.right)
+        return rotate_left(node)
+    return node
+
 
 class BinaryTree:
     def __init__(self):
         self.root = None
-    
-    def insert(self, data):
-        if self.root is None:
-            self.root = Node(data)
-        else:
-            self.__insert(self.root, data)
-    
-    def __insert(self, root, data):
-        if root.data['score'] > data['score']:
-            if root.left:
-                self.__insert(root.left, data)
+
+    def insert(self, data): # O(log n), equal keys go right like before
+        k = key(data)
+        path = []
+        node = self.root
+        while node:
+            path.append(node)
+            node = node.left if key(node.data) > k else node.right
+
+        child = Node(data)
+        for parent in reversed(path):
+            if key(parent.data) > k:
+                parent.left = child
             else:
-                root.left = Node(data)
-        else:
-            if root.right:
-                self.__insert(root.right, data)
+                parent.right = child
+            child = balance(parent)
+        self.root = child
+
+    def delete(self, data): # O(log n), removes the entry with data's score and name, returns it or None
+        k = key(data)
+        path = []
+        node = self.root
+        while node and key(node.data) != k:
+            path.append(node)
+            node = node.left if key(node.data) > k else node.right
+        if node is None:
+            return None
+        removed = node.data
+        if node.left and node.right: # take the next entry's place, then remove that one instead
+            path.append(node)
+            successor = node.right
+            while successor.left:
+                path.append(successor)
+                successor = successor.left
+            node.data = successor.data
+            node = successor
+        child = node.left or node.right
+        for parent in reversed(path):
+            if parent.left is node:
+                parent.left = child
             else:
-                root.right = Node(data)
+                parent.right = child
+            node = parent
+            child = balance(parent)
+        self.root = child
+        return removed
+
+    @staticmethod
+    def from_sorted(entries): # O(n) balanced build from entries sorted by key, lowest first
+        def build(lo, hi): # depth is only log n
+            if lo >= hi:
+                return None
+            mid = (lo + hi) // 2
+            node = Node(entries[mid])
+            node.left = build(lo, mid)
+            node.right = build(mid + 1, hi)
+            update(node)
+            return node
+        bst = BinaryTree()
+        bst.root = build(0, len(entries))
+        return bst
+
     def display(self): # left to right
         if self.root:
             for i in self.inorder(self.root):
                 print(i)
-    
+
     def inorder(self, root): # left to right only for debug lolz
-        if root:
-            yield from self.inorder(root.left)
+        stack = Stack()
+        while root or stack:
+            while root:
+                stack.insert(root)
+                root = root.left
+            root = stack.get()
             yield root.data
-            yield from self.inorder(root.right)
-    
+            root = root.right
+
+
 
-    
-    def reverse_inorder(self, root):
-        if root:
-            yield from self.reverse_inorder(root.right)
+    def reverse_inorder(self, root): # highest score first
+        stack = Stack()
+        while root or stack:
+            while root:
+                stack.insert(root)
+                root = root.right
+            root = stack.get()
             yield root.data
-            yield from self.reverse_inorder(root.left)
-    
-    # uses list for output
+            root = root.left
+
+    # uses list for output, O(log n + n) for n values since the traversal is lazy
     def get_first_values(self,n):
         result = []
         i = 0
@@ -56,29 +165,151 @@ class BinaryTree:
             if i == n:
                 break
             result.append(x)
-            i +=1 
+            i +=1
         return result
     def size(self, root):
-        if root:
-            return 1 + self.size(root.left) + self.size(root.right)
-        else:
-            return 0
-    
+        return size(root)
+
+    # order statistics, ranks are 1 based from the top score, O(log n) from the cached sizes
+    def rank(self, score): # rank this score has (or would get), ties share the better rank
+        greater = 0
+        node = self.root
+        while node:
+            if node.data['score'] > score:
+                greater += 1 + size(node.right)
+                node = node.left
+            else:
+                node = node.right
+        return greater + 1
+
+    def percentile(self, score): # percent of entries this score ties or beats
+        if not self.root:
+            return 100.0
+        return 100 * (len(self) - self.rank(score) + 1) / len(self)
+
+    def select(self, rank): # entry at the rank
+        if rank < 1 or rank > len(self):
+            raise IndexError("Rank out of bounds")
+        i = rank - 1
+        node = self.root
+        while True:
+            right = size(node.right)
+            if i < right:
+                node = node.right
+            elif i == right:
+                return node.data
+            else:
+                i -= right + 1
+                node = node.left
+
+    def values_from(self, rank): # highest score first starting at the rank, O(log n) to start
+        stack = Stack()
+        i = rank - 1
+        node = self.root
+        while node: # same walk as select, keeping what is left to visit on the stack
+            right = size(node.right)
+            if i < right:
+                stack.insert(node)
+                node = node.right
+            elif i == right:
+                stack.insert(node)
+                break
+            else:
+                i -= right + 1
+                node = node.left
+        while stack:
+            node = stack.get()
+            yield node.data
+            node = node.left
+            while node:
+                stack.insert(node)
+                node = node.right
+
+    def around(self, rank, before=2, after=2): # [(rank, entry)] window around the rank
+        start = max(1, rank - before)
+        result = []
+        for i, entry in enumerate(self.values_from(start), start):
+            if i > rank + after:
+                break
+            result.append((i, entry))
+        return result
+
     def __len__(self):
-        return self.size(self.root)
+        return size(self.root)
+
 
-    
     @staticmethod # independent method
-    def load_json():
+    def load_json(store=None): # every saved score, they live in the score store now (store.py)
         bst = BinaryTree()
-        if not os.path.exists('leaderboard.json'):
-            open('leaderboard.json', 'w+').write('[]')
-            return bst
-        with open('leaderboard.json', 'r+') as fl:
-            data = json.load(fl)
-        for i in data:
+        for i in (store or ScoreStore()).all():
             bst.insert(i)
         return bst
+
+
+class Leaderboards: # one tree per game mode, (rings, shuffle), old entries without a mode share (None, None)
+    # the game keeps one, a mode is read from the store the first time and every save after
+    # that is applied to its tree in place
+    def __init__(self, store=None):
+        self.store = store
+        self.trees = {}
+        self.names = {} # mode -> {name: entry}, what a save replaces
+        self.known = None # modes with scores, asked from the store once
+        self.lock = threading.RLock() # a mode can be loading on a background thread
+
+    @staticmethod
+    def mode(entry):
+        return entry.get('rings'), entry.get('shuffle')
+
+    def insert(self, data): # keeps the higher score per name like the store does, returns the entry that stays
+        mode = self.mode(data)
+        with self.lock:
+            tree = self.get(*mode)
+            names = self.names[mode]
+            old = names.get(data['name'])
+            if old is not None:
+                if old['score'] >= data['score']:
+                    return old
+                tree.delete(old)
+            tree.insert(data)
+            names[data['name']] = data
+            if self.known is not None:
+                self.known.add(mode)
+        return data
+
+    def save(self, name, score, rings=None, shuffle=None, replay=None): # O(log n), the store writes it in the background
+        kept = self.insert(entry(name, score, *from_row(*to_row(rings, shuffle))))
+        if self.store:
+            self.store.save(name, score, rings, shuffle, replay)
+        return kept
+
+    def get(self, rings, shuffle): # a mode is only read from the store the first time it is asked for
+        mode = (rings, shuffle)
+        tree = self.trees.get(mode)
+        if tree is None:
+            with self.lock: # waits for a prefetch of the same mode instead of loading it twice
+                tree = self.trees.get(mode)
+                if tree is None:
+                    entries = list(self.store.entries(rings, shuffle)) if self.store else []
+                    entries.sort(key=key) # store hands them out highest first, ties in any order
+                    self.names[mode] = {data['name']: data for data in entries}
+                    tree = self.trees[mode] = BinaryTree.from_sorted(entries)
+        return tree
+
+    def prefetch(self, rings, shuffle): # loads a mode on a background thread so get() doesnt have to
+        if (rings, shuffle) not in self.trees:
+            threading.Thread(target=self.get, args=(rings, shuffle), name='leaderboard', daemon=True).start()
+
+    def modes(self): # by ring count, old entries last
+        with self.lock:
+            if self.known is None:
+                self.known = set(self.store.modes()) if self.store else set()
+            modes = self.known | {mode for mode, tree in self.trees.items() if len(tree)} # a prefetch can be adding one
+        return sorted(modes, key=lambda mode: (mode[0] is None, mode[0] or 0, bool(mode[1])))
+
+    @staticmethod
+    def load(store=None):
+        return Leaderboards(store or ScoreStore())
+
 if __name__ == '__main__':
     root = BinaryTree()
 
@@ -87,4 +318,4 @@ if __name__ == '__main__':
     root.insert({"score": 6})
     root.insert({"score": 9})
 
-    print(root.get_first_values(7))
\ No newline at end of file
+    print(root.get_first_values(7))
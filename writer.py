@@ -0,0 +1,92 @@
+import json
+import os
+import tempfile
+import threading
+import traceback
+from collections import deque
+
+# one background thread for every disk write so the render loop never waits on the disk
+# jobs are keyed, submitting a key that is still queued replaces its job (only the latest
+# settings.json matters), key None always queues
+
+
+def atomic_write_json(path, data, **kwargs):
+    # temp file next to the target, fsync, then rename over it
+    # a crash or power cut leaves either the old file or the new one, never half of one
+    folder = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', suffix='.tmp', dir=folder)
+    try:
+        if os.path.exists(path): # mkstemp makes it private, keep the old file's mode
+            os.chmod(tmp, os.stat(path).st_mode & 0o777)
+        with os.fdopen(fd, 'w') as file:
+            json.dump(data, file, **kwargs)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    if hasattr(os, 'O_DIRECTORY'): # make the rename itself durable, posix only
+        dir_fd = os.open(folder, os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+class BackgroundWriter:
+    def __init__(self):
+        self.jobs = {} # key -> latest job
+        self.order = deque() # keys waiting, oldest first
+        self.count = 0 # unique ids for jobs without a key
+        self.busy = 0
+        self.cond = threading.Condition()
+        self.closed = False
+        self.thread = threading.Thread(target=self._run, name='writer', daemon=True)
+        self.thread.start()
+
+    def submit(self, key, job):
+        with self.cond:
+            if self.closed:
+                raise RuntimeError("Writer is closed")
+            if key is None:
+                self.count += 1
+                key = ('job', self.count)
+            if key not in self.jobs:
+                self.order.append(key)
+            self.jobs[key] = job
+            self.cond.notify_all()
+
+    def write_json(self, path, data, **kwargs): # coalesced per path
+        self.submit(path, lambda: atomic_write_json(path, data, **kwargs))
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.order and not self.closed:
+                    self.cond.wait()
+                if not self.order:
+                    return
+                key = self.order.popleft()
+                job = self.jobs.pop(key)
+                self.busy += 1
+            try:
+                job()
+            except Exception:
+                traceback.print_exc() # a failed write shouldnt take the writer down
+            finally:
+                with self.cond:
+                    self.busy -= 1
+                    self.cond.notify_all()
+
+    def flush(self, timeout=None): # blocks until everything queued so far is on disk
+        with self.cond:
+            return self.cond.wait_for(lambda: not self.order and not self.busy, timeout)
+
+    def close(self, timeout=None):
+        self.flush(timeout)
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+        self.thread.join(timeout)